@@ -7,13 +7,27 @@ of the BSD license. See the LICENSE file for details.
 """
 
 import gzip
+try:
+    # ISA-L uses SIMD-accelerated DEFLATE/CRC32 and is a drop-in gzip
+    # replacement, but only supports compression levels 0-3
+    from isal import igzip
+except ImportError:
+    igzip = None
 try:
     # if we import "lzma" first, we get pyliblzma on Py2, but we want backports.lzma
     #  so first try to import backports.lzma on Py2 and then 'lzma' on Py3
     from backports import lzma
 except ImportError:
     import lzma
+import hashlib
 import os
+import shutil
+import subprocess
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 from atomic_reactor.constants import (EXPORTED_COMPRESSED_IMAGE_NAME_TEMPLATE,
                                       IMAGE_TYPE_DOCKER_ARCHIVE)
@@ -21,6 +35,38 @@ from atomic_reactor.plugin import PostBuildPlugin
 from atomic_reactor.util import get_exported_image_metadata, human_size, is_scratch_build
 from atomic_reactor.utils import imageutil
 
+ISAL_MAX_COMPRESSLEVEL = 3
+
+
+class _HashingFile(object):
+    """File wrapper that hashes and counts bytes as they are written.
+
+    Lets the compressed size and checksums be computed in the same pass
+    that writes the archive, instead of re-reading it afterwards.
+    """
+
+    def __init__(self, fp, algorithms=('md5', 'sha256')):
+        self._fp = fp
+        self._hash_objs = [getattr(hashlib, algorithm)() for algorithm in algorithms]
+        self.size = 0
+
+    def write(self, data):
+        written = self._fp.write(data)
+        for hash_obj in self._hash_objs:
+            hash_obj.update(data)
+        self.size += len(data)
+        return written
+
+    def flush(self):
+        self._fp.flush()
+
+    def close(self):
+        self._fp.close()
+
+    def checksums(self):
+        return {'{}sum'.format(hash_obj.name): hash_obj.hexdigest()
+                for hash_obj in self._hash_objs}
+
 
 class CompressPlugin(PostBuildPlugin):
     """Example configuration:
@@ -33,49 +79,119 @@ class CompressPlugin(PostBuildPlugin):
             }
     }]
 
-    Currently supported compression methods are gzip and lzma; gzip is default.
+    Currently supported compression methods are gzip, lzma and zstd; gzip is default.
     By default, the plugin doesn't work on exported image, you have to explicitly
     ask for it by using `load_exported_image: true`.
     """
     key = 'compress'
     is_allowed_to_fail = False
 
-    def __init__(self, workflow, load_exported_image=False, method='gzip'):
+    def __init__(self, workflow, load_exported_image=False, method='gzip',
+                 compresslevel=1, lzma_preset=1):
         """
         :param workflow: DockerBuildWorkflow instance
         :param load_exported_image: bool, when running squash plugin with `dont_load=True`,
                                     you may load the exported tar with this switch
+        :param compresslevel: int, gzip compression level; the low default trades a
+                              slightly larger archive for much faster compression.
+                              Levels 0-3 use the SIMD-accelerated isal backend when
+                              it is available; levels 4-9 go through stdlib gzip
+        :param lzma_preset: int, lzma preset, analogous to compresslevel
         """
         super(CompressPlugin, self).__init__(workflow)
         self.load_exported_image = load_exported_image
         self.method = method
+        self.compresslevel = compresslevel
+        self.lzma_preset = lzma_preset
         self.uncompressed_size = 0
+        self.compressed_size = None
+        self.compressed_checksums = None
         self.source_build = bool(self.workflow.build_result.source_docker_archive)
 
     def _compress_image_stream(self, stream):
         outfile = os.path.join(self.workflow.source.workdir,
                                EXPORTED_COMPRESSED_IMAGE_NAME_TEMPLATE)
+        proc = None
+        outfh = None
         if self.method == 'gzip':
             outfile = outfile.format('gz')
-            fp = gzip.open(outfile, 'wb', compresslevel=6)
+            pigz = shutil.which('pigz')
+            if pigz:
+                proc = self._start_parallel_compressor(
+                    [pigz, '-{0}'.format(self.compresslevel)], outfile)
+                fp = proc.stdin
+            else:
+                outfh = _HashingFile(open(outfile, 'wb'))
+                if igzip is not None and self.compresslevel <= ISAL_MAX_COMPRESSLEVEL:
+                    fp = igzip.open(outfh, 'wb', compresslevel=self.compresslevel)
+                else:
+                    # isal rejects levels above 3; honor the requested level
+                    # with the stdlib implementation instead
+                    fp = gzip.open(outfh, 'wb', compresslevel=self.compresslevel)
         elif self.method == 'lzma':
             outfile = outfile.format('xz')
-            fp = lzma.open(outfile, 'wb')
+            pixz = shutil.which('pixz')
+            if pixz:
+                proc = self._start_parallel_compressor(
+                    [pixz, '-{0}'.format(self.lzma_preset)], outfile)
+                fp = proc.stdin
+            else:
+                outfh = _HashingFile(open(outfile, 'wb'))
+                fp = lzma.open(outfh, 'wb', preset=self.lzma_preset)
+        elif self.method == 'zstd':
+            if zstandard is None:
+                raise RuntimeError('zstd compression requires the zstandard package')
+            outfile = outfile.format('zst')
+            # threads=-1 compresses with one worker per CPU
+            cctx = zstandard.ZstdCompressor(level=self.compresslevel, threads=-1)
+            outfh = _HashingFile(open(outfile, 'wb'))
+            fp = cctx.stream_writer(outfh)
         else:
             raise RuntimeError('Unsupported compression format {0}'.format(self.method))
 
-        _chunk_size = 1024**2  # 1 MB chunk size for reading/writing
+        _chunk_size = 128 * 1024  # chunk size for reading/writing
         self.log.info('compressing image %s to %s using %s method',
                       self.workflow.image, outfile, self.method)
-        data = stream.read(_chunk_size)
-        while data != b'':
-            fp.write(data)
-            data = stream.read(_chunk_size)
-
-        self.uncompressed_size = stream.tell()
+        total = 0
+        if proc is not None and stream.seekable():
+            # regular file into a compressor pipe: move the bytes in-kernel,
+            # without copying them through user space at all
+            while True:
+                n = os.sendfile(fp.fileno(), stream.fileno(), None, _chunk_size)
+                if not n:
+                    break
+                total += n
+        else:
+            # reuse a single buffer instead of allocating a fresh chunk per read
+            buf = bytearray(_chunk_size)
+            view = memoryview(buf)
+            while True:
+                n = stream.readinto(buf)
+                if not n:
+                    break
+                fp.write(view[:n])
+                total += n
+        fp.close()
+        if outfh is not None:
+            outfh.close()
+            self.compressed_size = outfh.size
+            self.compressed_checksums = outfh.checksums()
+        if proc is not None:
+            returncode = proc.wait()
+            if returncode:
+                raise subprocess.CalledProcessError(returncode, proc.args)
+
+        self.uncompressed_size = total
 
         return outfile
 
+    @staticmethod
+    def _start_parallel_compressor(cmd, outfile):
+        """Spawn a multi-core compressor (pigz/pixz) writing to outfile."""
+        with open(outfile, 'wb') as outfh:
+            # the child keeps its own copy of the fd
+            return subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=outfh)
+
     def run(self):
         if is_scratch_build(self.workflow):
             # required only to make an archive for Koji
@@ -95,11 +211,13 @@ class CompressPlugin(PostBuildPlugin):
                 return
             image = self.workflow.image
             image_type = IMAGE_TYPE_DOCKER_ARCHIVE
-            self.log.info('fetching image %s from docker', image)
+            self.log.info('streaming image %s from the registry', image)
             # OSBS2 TBD
-            with imageutil.get_image(image) as image_stream:
+            with imageutil.get_image_stream(image) as image_stream:
                 outfile = self._compress_image_stream(image_stream)
-        metadata = get_exported_image_metadata(outfile, image_type)
+        metadata = get_exported_image_metadata(outfile, image_type,
+                                               size=self.compressed_size,
+                                               checksums=self.compressed_checksums)
 
         if self.uncompressed_size != 0:
             metadata['uncompressed_size'] = self.uncompressed_size
@@ -8,6 +8,7 @@ of the BSD license. See the LICENSE file for details.
 import hashlib
 import koji
 import os
+import re
 
 from atomic_reactor import util
 from atomic_reactor.constants import (PLUGIN_FETCH_MAVEN_KEY,
@@ -17,6 +18,7 @@ from atomic_reactor.config import get_koji_session
 from atomic_reactor.download import download_url
 from atomic_reactor.plugin import PreBuildPlugin
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from atomic_reactor.utils.koji import NvrRequest
 from atomic_reactor.utils.pnc import PNCUtil
 
@@ -33,6 +35,7 @@ class FetchMavenArtifactsPlugin(PreBuildPlugin):
     is_allowed_to_fail = False
 
     DOWNLOAD_DIR = 'artifacts'
+    DOWNLOAD_THREADS = 8
 
     def __init__(self, workflow):
         """
@@ -44,6 +47,10 @@ class FetchMavenArtifactsPlugin(PreBuildPlugin):
 
         all_allowed_domains = self.workflow.conf.artifacts_allowed_domains
         self.allowed_domains = set(domain.lower() for domain in all_allowed_domains or [])
+        # one anchored alternation instead of a startswith() per domain per URL
+        self._allowed_domains_re = re.compile(
+            '|'.join(re.escape(domain) for domain in sorted(self.allowed_domains))
+        ) if self.allowed_domains else None
         self.workdir = self.workflow.source.get_build_file_path()[1]
         self.session = None
         self._pnc_util = None
@@ -106,14 +113,16 @@ class FetchMavenArtifactsPlugin(PreBuildPlugin):
     def process_by_url(self, url_requests):
         download_queue = []
         errors = []
+        # bind the matcher once instead of re-resolving it per URL
+        match_allowed = self._allowed_domains_re.match if self._allowed_domains_re else None
 
         for url_request in url_requests:
             url = url_request['url']
 
-            if self.allowed_domains:
+            if match_allowed:
                 parsed_file_url = urlparse(url.lower())
                 file_url = parsed_file_url.netloc + parsed_file_url.path
-                if not any(file_url.startswith(prefix) for prefix in self.allowed_domains):
+                if not match_allowed(file_url):
                     errors.append('File URL {} is not in list of allowed domains: {}'
                                   .format(file_url, self.allowed_domains))
                     continue
@@ -147,15 +156,16 @@ class FetchMavenArtifactsPlugin(PreBuildPlugin):
         insecure = koji_config.get('insecure_download', False)
 
         self.log.debug('%d files to download', len(downloads))
-        session = util.get_retrying_requests_session()
+        # one keep-alive session for all downloads, with a connection pool
+        # sized so every download thread can hold a connection open
+        session = util.get_retrying_requests_session(pool_maxsize=self.DOWNLOAD_THREADS)
 
-        for index, download in enumerate(downloads):
+        def download_file(index, download):
             dest_path = os.path.join(artifacts_path, download.dest)
             dest_dir = dest_path.rsplit('/', 1)[0]
             dest_filename = dest_path.rsplit('/', 1)[-1]
 
-            if not os.path.exists(dest_dir):
-                os.makedirs(dest_dir)
+            os.makedirs(dest_dir, exist_ok=True)
 
             self.log.debug('%d/%d downloading %s', index + 1, len(downloads),
                            download.url)
@@ -163,6 +173,15 @@ class FetchMavenArtifactsPlugin(PreBuildPlugin):
             download_url(url=download.url, dest_dir=dest_dir, insecure=insecure, session=session,
                          dest_filename=dest_filename, expected_checksums=download.checksums)
 
+        # the artifacts are typically many small files; downloading them
+        # concurrently over a shared session makes the wall time scale with
+        # the slowest download rather than the sum of all of them
+        with ThreadPoolExecutor(max_workers=self.DOWNLOAD_THREADS) as executor:
+            futures = [executor.submit(download_file, index, download)
+                       for index, download in enumerate(downloads)]
+            for future in as_completed(futures):
+                future.result()
+
     def run(self):
         self.session = get_koji_session(self.workflow.conf)
 
@@ -19,14 +19,19 @@ import shutil
 import tempfile
 from typing import Iterator, Sequence, Dict, Union, List, BinaryIO, Tuple, Optional
 import logging
-import uuid
 import yaml
+try:
+    # libyaml-backed loader, parses identically to SafeLoader but much faster
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YamlSafeLoader
 import string
 import signal
 import tarfile
 from collections import namedtuple
 from copy import deepcopy
 from base64 import b64decode
+from functools import lru_cache
 from typing import Callable
 
 from urllib.parse import urlparse
@@ -107,7 +112,7 @@ def figure_out_build_file(absolute_path, local_path=None):
         # Without this check, there would be a confusing 'Dockerfile has not yet been generated'
         # exception later.
         with open(build_file_path) as f:
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=YamlSafeLoader)
             if data is None or 'flatpak' not in data:
                 raise RuntimeError("container.yaml found, but no accompanying Dockerfile")
 
@@ -246,26 +251,27 @@ class LazyGit(object):
         self.commit = git_reference
 
 
+_DOLLAR_TABLE = str.maketrans({'$': r'\$'})
+
+
 def escape_dollar(v):
-    try:
-        str_type = unicode
-    except NameError:
-        str_type = str
-    if isinstance(v, str_type):
-        return v.replace('$', r'\$')
+    if isinstance(v, str):
+        return v.translate(_DOLLAR_TABLE)
     else:
         return v
 
 
 def render_yum_repo(repo, escape_dollars=True):
-    repo.setdefault("name", str(uuid.uuid4().hex[:6]))
+    # os.urandom gives us the 6 hex chars without building a whole UUID
+    repo.setdefault("name", os.urandom(3).hex())
     repo_name = repo["name"]
     logger.info("rendering repo '%s'", repo_name)
-    rendered_repo = '[%s]\n' % repo_name
+    rendered_lines = ['[%s]' % repo_name]
     for key, value in repo.items():
         if escape_dollars:
             value = escape_dollar(value)
-        rendered_repo += "%s=%s\n" % (key, value)
+        rendered_lines.append("%s=%s" % (key, value))
+    rendered_repo = '\n'.join(rendered_lines) + '\n'
     logger.info("rendered repo: %r", rendered_repo)
     return rendered_repo
 
@@ -402,13 +408,24 @@ def get_checksums(filename: Union[str, BinaryIO], algorithms: List[str]) -> Dict
     return checksums
 
 
-def get_exported_image_metadata(path, image_type):
+def get_exported_image_metadata(path, image_type, size=None, checksums=None):
+    """
+    Build the metadata dict for an exported image.
+
+    :param path: str, path to the exported image
+    :param image_type: str, type of the exported image
+    :param size: int, size of the image when already known, to avoid a stat
+    :param checksums: dict, md5sum/sha256sum computed while the image was
+                      written, to avoid re-reading the file
+    """
     logger.info('getting metadata for exported image %s (%s)', path, image_type)
     metadata = {'path': path, 'type': image_type}
     if image_type != IMAGE_TYPE_OCI:
-        metadata['size'] = os.path.getsize(path)
+        metadata['size'] = os.path.getsize(path) if size is None else size
         logger.debug('size: %d bytes', metadata['size'])
-        metadata.update(get_checksums(path, ['md5', 'sha256']))
+        if checksums is None:
+            checksums = get_checksums(path, ['md5', 'sha256'])
+        metadata.update(checksums)
     return metadata
 
 
@@ -1374,6 +1391,12 @@ def read_yaml(yaml_data, schema, package='atomic_reactor'):
     return osbs_yaml.read_yaml(yaml_data, schema, package)
 
 
+@lru_cache(maxsize=None)
+def _load_schema(package: str, schema: str) -> dict:
+    """Load a JSON schema resource, cached; schemas are static package data."""
+    return osbs_yaml.load_schema(package, schema)
+
+
 def validate_with_schema(data: dict, schema: str, package: str = "atomic_reactor") -> None:
     """Validate data against a JSON schema.
 
@@ -1382,8 +1405,7 @@ def validate_with_schema(data: dict, schema: str, package: str = "atomic_reactor
     :param package: package name containing the JSON schema file
     :raises osbs.OsbsValidationException: if the data is not valid according to the schema
     """
-    schema = osbs_yaml.load_schema(package, schema)
-    osbs_yaml.validate_with_schema(data, schema)
+    osbs_yaml.validate_with_schema(data, _load_schema(package, schema))
 
 
 def allow_repo_dir_in_dockerignore(build_path):
@@ -6,7 +6,9 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 
+import contextlib
 import functools
+import subprocess
 from typing import Optional, Union
 
 from osbs.utils import ImageName
@@ -122,3 +124,21 @@ def get_image(image):
     # self.tasker.get_image(image)
     # use skopeo copy
     return {}
+
+
+@contextlib.contextmanager
+def get_image_stream(image):
+    """Stream the image as a docker-archive without materializing it on disk.
+
+    Yields a readable pipe fed by skopeo; the tarball bytes never hit
+    stable storage on the way to the consumer.
+    """
+    cmd = ['skopeo', 'copy', 'docker://{}'.format(image), 'docker-archive:/dev/stdout']
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        yield proc.stdout
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
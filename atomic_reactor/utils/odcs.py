@@ -7,8 +7,10 @@ of the BSD license. See the LICENSE file for details.
 """
 
 from atomic_reactor.util import get_retrying_requests_session
+from concurrent.futures import ThreadPoolExecutor
 from textwrap import dedent
 
+import functools
 import json
 import logging
 import time
@@ -30,9 +32,13 @@ class WaitComposeToFinishTimeout(Exception):
                 .format(self.compose_id, self.timeout))
 
 
+@functools.lru_cache(maxsize=None)
 def construct_compose_url(url, compose_id):
     """Construct an ODCS compose URL
 
+    The result is cached: the wait loop asks for the same compose URL on
+    every poll, so build the string only once per compose.
+
     :param str url: the ODCS server API URL, for example
         https://odcs.example.com/odcs/1/. Note that the trailing slash
         character is optional.
@@ -43,6 +49,29 @@ def construct_compose_url(url, compose_id):
     return '{}/composes/{}'.format(url.rstrip('/'), compose_id)
 
 
+@functools.lru_cache(maxsize=8)
+def _get_session(insecure, token, cert):
+    """Build a retrying session for the given connection options.
+
+    Sessions are cached so that ODCSClient instances created with identical
+    options reuse one connection pool (and its TLS connections) instead of
+    handshaking again for every client.
+    """
+    # method_whitelist=False allows retrying non-idempotent methods like POST
+    session = get_retrying_requests_session(method_whitelist=False)
+
+    session.verify = not insecure
+
+    if token:
+        session.headers[ODCSClient.OIDC_TOKEN_HEADER] = '%s %s' % (ODCSClient.OIDC_TOKEN_TYPE,
+                                                                   token)
+
+    if cert:
+        session.cert = cert
+
+    return session
+
+
 class ODCSClient(object):
 
     DEFAULT_WAIT_TIMEOUT = 3600
@@ -55,18 +84,7 @@ class ODCSClient(object):
         self._setup_session(insecure=insecure, token=token, cert=cert)
 
     def _setup_session(self, insecure, token, cert):
-        # method_whitelist=False allows retrying non-idempotent methods like POST
-        session = get_retrying_requests_session(method_whitelist=False)
-
-        session.verify = not insecure
-
-        if token:
-            session.headers[self.OIDC_TOKEN_HEADER] = '%s %s' % (self.OIDC_TOKEN_TYPE, token)
-
-        if cert:
-            session.cert = cert
-
-        self.session = session
+        self.session = _get_session(insecure, token, cert)
 
     def _get_compose_url(self, compose_id):
         return construct_compose_url(self.url, compose_id)
@@ -167,11 +185,10 @@ class ODCSClient(object):
         """Wait for compose request to finalize
 
         :param compose_id: int, compose ID to wait for
-        :param burst_retry: int, seconds to wait between retries prior to exceeding
-                            the burst length
-        :param burst_length: int, seconds to switch to slower retry period
-        :param slow_retry: int, seconds to wait between retries after exceeding
-                           the burst length
+        :param burst_retry: int, initial seconds to wait between retries; the wait
+                            doubles on every poll up to slow_retry
+        :param burst_length: int, deprecated, kept for backwards compatibility
+        :param slow_retry: int, maximum seconds to wait between retries
 
         :return: dict, updated status of compose.
         :raise RuntimeError: if state_name becomes 'failed'
@@ -179,10 +196,20 @@ class ODCSClient(object):
         logger.debug("Getting compose information for information for compose_id=%s",
                      compose_id)
         start_time = time.time()
+        etag = None
+        last_status = None
+        delay = burst_retry
         while True:
-            response = self.session.get(self._get_compose_url(compose_id))
-            response.raise_for_status()
-            response_json = response.json()
+            headers = {'If-None-Match': etag} if etag else None
+            response = self.session.get(self._get_compose_url(compose_id), headers=headers)
+            if response.status_code == 304:
+                # not modified, the compose state has not changed since the last poll
+                response_json = last_status
+            else:
+                response.raise_for_status()
+                response_json = response.json()
+                etag = response.headers.get('ETag')
+                last_status = response_json
 
             if response_json['state_name'] == 'failed':
                 state_reason = response_json.get('state_reason', 'Unknown')
@@ -194,8 +221,10 @@ class ODCSClient(object):
                                    .format(compose_id, state_reason))
 
             if response_json['state_name'] not in ['wait', 'generating']:
-                logger.debug("Retrieved compose information for compose_id=%s: %s",
-                             compose_id, json.dumps(response_json, indent=4))
+                # pretty-printing the payload is not free, only do it when it will be shown
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Retrieved compose information for compose_id=%s: %s",
+                                 compose_id, json.dumps(response_json, indent=4))
                 return response_json
 
             elapsed = time.time() - start_time
@@ -205,10 +234,26 @@ class ODCSClient(object):
                 logger.debug("Retrying request compose_id=%s, elapsed_time=%s",
                              compose_id, elapsed)
 
-                if elapsed > burst_length:
-                    time.sleep(slow_retry)
-                else:
-                    time.sleep(burst_retry)
+                time.sleep(delay)
+                # back off exponentially instead of hammering a slow compose
+                delay = min(slow_retry, delay * 2)
+
+    def wait_for_composes(self, compose_ids):
+        """Wait for multiple composes to finalize, polling them concurrently
+
+        Waiting for composes one at a time pays the full polling latency for
+        each of them; polling them all at once makes the wall time the
+        maximum instead of the sum.
+
+        :param compose_ids: list<int>, compose IDs to wait for
+        :return: list<dict>, updated statuses, in the same order as compose_ids
+        :raise RuntimeError: if any compose fails
+        """
+        if not compose_ids:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(16, len(compose_ids))) as executor:
+            return list(executor.map(self.wait_for_compose, compose_ids))
 
     def cancel_compose(self, compose_id):
         """Cancel a compose by sending a DELETE request with compose id"""
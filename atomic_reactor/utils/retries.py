@@ -55,7 +55,9 @@ def hook_log_error_response_content(response, *args, **kwargs):
 
 def get_retrying_requests_session(client_statuses=HTTP_CLIENT_STATUS_RETRY,
                                   times=HTTP_MAX_RETRIES, delay=HTTP_BACKOFF_FACTOR,
-                                  method_whitelist=None, raise_on_status=True):
+                                  method_whitelist=None, raise_on_status=True,
+                                  pool_connections=requests.adapters.DEFAULT_POOLSIZE,
+                                  pool_maxsize=requests.adapters.DEFAULT_POOLSIZE):
     if _http_retries_disabled():
         times = 0
 
@@ -72,8 +74,12 @@ def get_retrying_requests_session(client_statuses=HTTP_CLIENT_STATUS_RETRY,
         retry.raise_on_status = raise_on_status
 
     session = SessionWithTimeout()
-    session.mount('http://', HTTPAdapter(max_retries=retry))
-    session.mount('https://', HTTPAdapter(max_retries=retry))
+    # keep-alive connections are pooled per host; callers that issue many
+    # concurrent requests can size the pool to match their worker count
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
     session.hooks['response'] = [hook_log_error_response_content]
 
     return session
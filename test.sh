@@ -89,7 +89,9 @@ function setup_osbs() {
 case ${ACTION} in
 "test")
   setup_osbs
-  TEST_CMD="coverage run --source=atomic_reactor -m pytest tests"
+  # pytest-cov measures inside the xdist workers, where the tests actually
+  # run; plain "coverage run" would only trace the controller process
+  TEST_CMD="${PYTHON} -m pytest --cov=atomic_reactor --cov-report= tests"
   ;;
 "pylint")
   setup_osbs
@@ -6,7 +6,11 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 import json
+import os
+import re
 from pathlib import Path
+from types import MappingProxyType
+from unittest.mock import MagicMock
 
 from flexmock import flexmock
 
@@ -14,6 +18,11 @@ import koji
 import pytest
 import responses
 import yaml
+try:
+    # libyaml-backed dumper, same output as SafeDumper but much faster
+    from yaml import CSafeDumper as YamlSafeDumper
+except ImportError:
+    from yaml import SafeDumper as YamlSafeDumper
 
 from atomic_reactor.constants import (REPO_FETCH_ARTIFACTS_KOJI,
                                       REPO_FETCH_ARTIFACTS_PNC,
@@ -25,6 +34,9 @@ from textwrap import dedent
 
 from tests.mock_env import MockEnv
 
+# the frozen fixture mappings below serialize exactly like plain dicts
+yaml.add_representer(MappingProxyType, YamlSafeDumper.represent_dict, Dumper=YamlSafeDumper)
+
 KOJI_HUB = 'https://koji-hub.com'
 KOJI_ROOT = 'https://koji-root.com'
 PNC_ROOT = 'https://pnc-root.com'
@@ -43,7 +55,7 @@ DEFAULT_KOJI_BUILD = {
     'version': '2.2.11.4',
 }
 
-ARCHIVE_JAXB_SUN_POM = {
+ARCHIVE_JAXB_SUN_POM = MappingProxyType({
     'artifact_id': 'jaxb-core',
     'build_id': 472397,
     'checksum': '697317209103338c7c841e327bb6e7b0',
@@ -53,9 +65,9 @@ ARCHIVE_JAXB_SUN_POM = {
     'id': 1269850,
     'size': 15320,
     'version': '2.2.11-4'
-}
+})
 
-ARCHIVE_JAXB_SUN_JAR = {
+ARCHIVE_JAXB_SUN_JAR = MappingProxyType({
     'artifact_id': 'jaxb-core',
     'build_id': 472397,
     'checksum': '06bae6472e3d1635f0c3b79bd314fdf3',
@@ -65,9 +77,9 @@ ARCHIVE_JAXB_SUN_JAR = {
     'id': 1269849,
     'size': 252461,
     'version': '2.2.11-4'
-}
+})
 
-ARCHIVE_JAXB_JAVADOC_SUN_JAR = {
+ARCHIVE_JAXB_JAVADOC_SUN_JAR = MappingProxyType({
     'artifact_id': 'jaxb-core',
     'build_id': 472397,
     'checksum': '3643ba275364b29117f2bc5f0bcf18d9',
@@ -77,9 +89,9 @@ ARCHIVE_JAXB_JAVADOC_SUN_JAR = {
     'id': 1269848,
     'size': 819956,
     'version': '2.2.11-4'
-}
+})
 
-ARCHIVE_JAXB_GLASSFISH_POM = {
+ARCHIVE_JAXB_GLASSFISH_POM = MappingProxyType({
     'artifact_id': 'jaxb-core',
     'build_id': 472397,
     'checksum': 'cc7b7a4d1c33d83fba9adf95226af570',
@@ -89,9 +101,9 @@ ARCHIVE_JAXB_GLASSFISH_POM = {
     'id': 1269791,
     'size': 3092,
     'version': '2.2.11-4'
-}
+})
 
-ARCHIVE_JAXB_GLASSFISH_JAR = {
+ARCHIVE_JAXB_GLASSFISH_JAR = MappingProxyType({
     'artifact_id': 'jaxb-core',
     'build_id': 472397,
     'checksum': '2ba4912b1a3c699b09ec99e19820fb09',
@@ -101,9 +113,9 @@ ARCHIVE_JAXB_GLASSFISH_JAR = {
     'id': 1269790,
     'size': 156400,
     'version': '2.2.11-4'
-}
+})
 
-ARCHIVE_JAXB_JAVADOC_GLASSFIX_JAR = {
+ARCHIVE_JAXB_JAVADOC_GLASSFIX_JAR = MappingProxyType({
     'artifact_id': 'jaxb-core',
     'build_id': 472397,
     'checksum': '69bc6de0a57dd10c7370573a8e76f0b2',
@@ -113,9 +125,9 @@ ARCHIVE_JAXB_JAVADOC_GLASSFIX_JAR = {
     'id': 1269789,
     'size': 524417,
     'version': '2.2.11-4'
-}
+})
 
-ARCHIVE_SHA1 = {
+ARCHIVE_SHA1 = MappingProxyType({
     'artifact_id': 'jaxb-sha1',
     'build_id': 472397,
     'checksum': '66bd6b88ba636993ad0fd522cc1254c9ff5f5a1c',
@@ -125,9 +137,9 @@ ARCHIVE_SHA1 = {
     'id': 1269792,
     'size': 524417,
     'version': '2.2.11-4'
-}
+})
 
-ARCHIVE_SHA256 = {
+ARCHIVE_SHA256 = MappingProxyType({
     'artifact_id': 'jaxb-sha256',
     'build_id': 472397,
     'checksum': 'ca52bcbda16954c9e83e4c0049277ac77f014ecc16a94ed92bc3203fa13aac7d',
@@ -137,12 +149,12 @@ ARCHIVE_SHA256 = {
     'id': 1269792,
     'size': 524417,
     'version': '2.2.11-4'
-}
+})
 
 # To avoid having to actually download archives during testing,
 # the checksum value is based on the mocked download response,
 # which is simply the "filename" and "group_id" values.
-DEFAULT_ARCHIVES = [
+DEFAULT_ARCHIVES = (
     ARCHIVE_JAXB_SUN_POM,
     ARCHIVE_JAXB_SUN_JAR,
     ARCHIVE_JAXB_JAVADOC_SUN_JAR,
@@ -151,45 +163,45 @@ DEFAULT_ARCHIVES = [
     ARCHIVE_JAXB_JAVADOC_GLASSFIX_JAR,
     ARCHIVE_SHA1,
     ARCHIVE_SHA256,
-]
+)
 
-REMOTE_FILE_SPAM = {
+REMOTE_FILE_SPAM = MappingProxyType({
     'url': FILER_ROOT + '/spam/spam.jar',
     'source-url': FILER_ROOT + '/spam/spam-sources.tar',
     'md5': 'ec61f019a3d0826c04ab20c55462aa24',
     'source-md5': 'b4dbaf349d175aa5bbd5c5d076c00393',
-}
+})
 
-REMOTE_FILE_BACON = {
+REMOTE_FILE_BACON = MappingProxyType({
     'url': FILER_ROOT + '/bacon/bacon.jar',
     'source-url': FILER_ROOT + '/bacon/bacon-sources.tar',
     'md5': 'b4dbaf349d175aa5bbd5c5d076c00393',
     'source-md5': 'b1605c846e03035a6538873e993847e5',
-}
+})
 
-REMOTE_FILE_WITH_TARGET = {
+REMOTE_FILE_WITH_TARGET = MappingProxyType({
     'url': FILER_ROOT + '/eggs/eggs.jar',
     'source-url': FILER_ROOT + '/eggs/eggs-sources.tar',
     'md5': 'b1605c846e03035a6538873e993847e5',
     'source-md5': 'ec61f019a3d0826c04ab20c55462aa24',
     'target': 'sgge.jar'
-}
+})
 
-REMOTE_FILE_SHA1 = {
+REMOTE_FILE_SHA1 = MappingProxyType({
     'url': FILER_ROOT + '/ham/ham.jar',
     'source-url': FILER_ROOT + '/ham/ham-sources.tar',
     'sha1': 'c4f8d66d78f5ed17299ae88fed9f8a8c6f3c592a',
     'source-sha1': '0eb3dc253aeda45e272f07cf6e77fcc8bcf6628a',
-}
+})
 
-REMOTE_FILE_SHA256 = {
+REMOTE_FILE_SHA256 = MappingProxyType({
     'url': FILER_ROOT + '/sausage/sausage.jar',
     'source-url': FILER_ROOT + '/sausage/sausage-sources.tar',
     'sha256': '0da8e7df6c45b1006b10e4d0df5e1a8d5c4dc17c2c9c0ab53c5714dadb705d1c',
     'source-sha256': '05892a95a8257a6c51a5ee4ba122e14e9719d7ead3b1d44e7fbea604da2fc8d1'
-}
+})
 
-REMOTE_FILE_MULTI_HASH = {
+REMOTE_FILE_MULTI_HASH = MappingProxyType({
     'url': FILER_ROOT + '/biscuit/biscuit.jar',
     'source-url': FILER_ROOT + '/biscuit/biscuit-sources.tar',
     'sha256': '05892a95a8257a6c51a5ee4ba122e14e9719d7ead3b1d44e7fbea604da2fc8d1',
@@ -198,15 +210,15 @@ REMOTE_FILE_MULTI_HASH = {
     'source-sha1': 'c4f8d66d78f5ed17299ae88fed9f8a8c6f3c592a',
     'md5': '24e4dec8666658ec7141738dbde951c5',
     'source-md5': 'b1605c846e03035a6538873e993847e5',
-}
+})
 
 # To avoid having to actually download archives during testing,
 # the md5 value is based on the mocked download response,
 # which is simply the url.
-DEFAULT_REMOTE_FILES = [REMOTE_FILE_SPAM, REMOTE_FILE_BACON, REMOTE_FILE_WITH_TARGET,
-                        REMOTE_FILE_SHA1, REMOTE_FILE_SHA256, REMOTE_FILE_MULTI_HASH]
+DEFAULT_REMOTE_FILES = (REMOTE_FILE_SPAM, REMOTE_FILE_BACON, REMOTE_FILE_WITH_TARGET,
+                        REMOTE_FILE_SHA1, REMOTE_FILE_SHA256, REMOTE_FILE_MULTI_HASH)
 
-ARTIFACT_MD5 = {
+ARTIFACT_MD5 = MappingProxyType({
     'build_id': '12',
     'artifacts': [
         {
@@ -214,9 +226,9 @@ ARTIFACT_MD5 = {
             'target': 'md5.jar'
         }
     ]
-}
+})
 
-ARTIFACT_SHA1 = {
+ARTIFACT_SHA1 = MappingProxyType({
     'build_id': '12',
     'artifacts': [
         {
@@ -224,9 +236,9 @@ ARTIFACT_SHA1 = {
             'target': 'sha1.jar'
         }
     ]
-}
+})
 
-ARTIFACT_SHA256 = {
+ARTIFACT_SHA256 = MappingProxyType({
     'build_id': '12',
     'artifacts': [
         {
@@ -234,9 +246,9 @@ ARTIFACT_SHA256 = {
             'target': 'sha256.jar'
         }
     ]
-}
+})
 
-ARTIFACT_MULTI_HASH = {
+ARTIFACT_MULTI_HASH = MappingProxyType({
     'build_id': '12',
     'artifacts': [
         {
@@ -244,42 +256,55 @@ ARTIFACT_MULTI_HASH = {
             'target': 'multi-hash.jar'
         }
     ]
-}
+})
 
-RESPONSE_MD5 = {
+RESPONSE_MD5 = MappingProxyType({
     'id': '122',
     'publicUrl': FILER_ROOT + '/md5.jar',
     'md5': '900150983cd24fb0d6963f7d28e17f72'
-}
+})
 
-RESPONSE_SHA1 = {
+RESPONSE_SHA1 = MappingProxyType({
     'id': '123',
     'publicUrl': FILER_ROOT + '/sha1.jar',
     'sha1': 'a9993e364706816aba3e25717850c26c9cd0d89d'
-}
+})
 
-RESPONSE_SHA256 = {
+RESPONSE_SHA256 = MappingProxyType({
     'id': '124',
     'publicUrl': FILER_ROOT + '/sha256.jar',
     'sha256': 'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad'
-}
+})
 
-RESPONSE_MULTI_HASH = {
+RESPONSE_MULTI_HASH = MappingProxyType({
     'id': '125',
     'publicUrl': FILER_ROOT + '/multi-hash.jar',
     'sha256': 'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad',
     'sha1': 'a9993e364706816aba3e25717850c26c9cd0d89d',
     'md5': '900150983cd24fb0d6963f7d28e17f72'
-}
+})
 
-DEFAULT_PNC_ARTIFACTS = {'builds': [ARTIFACT_MD5, ARTIFACT_SHA1, ARTIFACT_SHA256,
-                                    ARTIFACT_MULTI_HASH]}
+DEFAULT_PNC_ARTIFACTS = MappingProxyType(
+    {'builds': (ARTIFACT_MD5, ARTIFACT_SHA1, ARTIFACT_SHA256, ARTIFACT_MULTI_HASH)})
 
-DEFAULT_PNC_RESPONSES = {
+DEFAULT_PNC_RESPONSES = MappingProxyType({
     RESPONSE_MD5['id']: RESPONSE_MD5,
     RESPONSE_SHA1['id']: RESPONSE_SHA1,
     RESPONSE_SHA256['id']: RESPONSE_SHA256,
     RESPONSE_MULTI_HASH['id']: RESPONSE_MULTI_HASH
+})
+
+# serialize the default fixture payloads once instead of re-dumping
+# the same constants in every test
+DEFAULT_KOJI_NVR_YAML = dedent("""\
+    - nvr: com.sun.xml.bind.mvn-jaxb-parent-2.2.11.4-1
+    """)
+DEFAULT_PNC_ARTIFACTS_YAML = yaml.dump(DEFAULT_PNC_ARTIFACTS, Dumper=YamlSafeDumper)
+DEFAULT_REMOTE_FILES_YAML = yaml.dump(DEFAULT_REMOTE_FILES, Dumper=YamlSafeDumper)
+
+DEFAULT_PNC_RESPONSES_JSON = {
+    artifact_id: json.dumps(body, default=dict)
+    for artifact_id, body in DEFAULT_PNC_RESPONSES.items()
 }
 
 
@@ -287,9 +312,10 @@ class MockSource(object):
     def __init__(self, source_dir: Path):
         self.dockerfile_path = str(source_dir / DOCKERFILE_FILENAME)
         self.path = str(source_dir)
+        self._build_file_path = (self.dockerfile_path, self.path)
 
     def get_build_file_path(self):
-        return self.dockerfile_path, self.path
+        return self._build_file_path
 
 
 class X(object):
@@ -310,22 +336,27 @@ class MockedPathInfo(object):
         return '{group_id}/{artifact_id}/{version}/{filename}'.format(**maveninfo)
 
 
+DEFAULT_REACTOR_CONFIG_MAP = {
+    'version': 1,
+    'koji': {
+        'hub_url': KOJI_HUB,
+        'root_url': KOJI_ROOT,
+        'auth': {}
+    },
+    'pnc': {
+        'base_api_url': PNC_ROOT,
+        'get_artifact_path': 'artifacts/{}',
+    },
+}
+
+
 def mock_env(workflow, source_dir: Path, r_c_m=None, domains_override=None):
     if not r_c_m:
-        r_c_m = {
-            'version': 1,
-            'koji': {
-                'hub_url': KOJI_HUB,
-                'root_url': KOJI_ROOT,
-                'auth': {}
-            },
-            'pnc': {
-                'base_api_url': PNC_ROOT,
-                'get_artifact_path': 'artifacts/{}',
-            },
-        }
+        r_c_m = DEFAULT_REACTOR_CONFIG_MAP
 
     if domains_override:
+        # copy first, the default config map is shared between tests
+        r_c_m = dict(r_c_m)
         r_c_m.setdefault('artifacts_allowed_domains', domains_override)
 
     env = (MockEnv(workflow)
@@ -338,65 +369,124 @@ def mock_env(workflow, source_dir: Path, r_c_m=None, domains_override=None):
     return env
 
 
-def mock_koji_session(koji_proxyuser=None, koji_ssl_certs_dir=None,
-                      koji_krb_principal=None, koji_krb_keytab=None,
-                      build_info=None, archives=None):
-    if not build_info:
-        build_info = DEFAULT_KOJI_BUILD
-    if not archives:
-        archives = DEFAULT_ARCHIVES
-
-    flexmock(koji, PathInfo=MockedPathInfo)
-
-    session = flexmock()
-
-    (flexmock(koji)
-        .should_receive('ClientSession')
-        .once()
-        .and_return(session))
+@pytest.fixture(autouse=True)
+def koji_session(monkeypatch):
+    """Mock the koji session every test in this module needs.
 
+    MagicMock does no expectation bookkeeping per call, which keeps the
+    getBuild/listArchives traffic cheap; the one-session-per-test
+    expectation is asserted on teardown instead.
+    """
     def mock_get_build(nvr):
         if nvr == DEFAULT_KOJI_BUILD['nvr']:
             return DEFAULT_KOJI_BUILD
         else:
             return None
-    (session
-        .should_receive('getBuild')
-        .replace_with(mock_get_build))
 
-    (session
-        .should_receive('listArchives')
-        .and_return(archives))
+    session = MagicMock()
+    session.getBuild.side_effect = mock_get_build
+    session.listArchives.return_value = DEFAULT_ARCHIVES
+    session.krb_login.return_value = True
 
-    (session
-        .should_receive('krb_login')
-        .and_return(True))
-    return session
+    client_session = MagicMock(return_value=session)
+    monkeypatch.setattr(koji, 'ClientSession', client_session)
+    monkeypatch.setattr(koji, 'PathInfo', MockedPathInfo)
+
+    yield session
+
+    assert client_session.call_count == 1
 
 
 def mock_fetch_artifacts_by_nvr(source_dir: Path, contents=None):
     if contents is None:
-        contents = dedent("""\
-            - nvr: com.sun.xml.bind.mvn-jaxb-parent-2.2.11.4-1
-            """)
+        contents = DEFAULT_KOJI_NVR_YAML
 
     source_dir.joinpath(REPO_FETCH_ARTIFACTS_KOJI).write_text(contents, "utf-8")
 
 
 def mock_fetch_artifacts_from_pnc(source_dir: Path, contents=None):
     if contents is None:
-        contents = yaml.safe_dump(DEFAULT_PNC_ARTIFACTS)
+        contents = DEFAULT_PNC_ARTIFACTS_YAML
 
     source_dir.joinpath(REPO_FETCH_ARTIFACTS_PNC).write_text(contents, "utf-8")
 
 
 def mock_fetch_artifacts_by_url(source_dir: Path, contents=None):
     if contents is None:
-        contents = yaml.safe_dump(DEFAULT_REMOTE_FILES)
+        contents = DEFAULT_REMOTE_FILES_YAML
 
     source_dir.joinpath(REPO_FETCH_ARTIFACTS_URL).write_text(contents, "utf-8")
 
 
+def assert_all_downloads_exist(source_dir: Path, download_queue):
+    """Check the downloaded files against the queue in one directory sweep.
+
+    A single walk of the download directory replaces one stat() call per
+    queued file (the artifact destinations can be nested paths).
+    """
+    download_dir = source_dir.joinpath(FetchMavenArtifactsPlugin.DOWNLOAD_DIR)
+    present = {
+        os.path.relpath(os.path.join(dirpath, filename), download_dir)
+        for dirpath, _, filenames in os.walk(download_dir)
+        for filename in filenames
+    }
+    missing = {download.dest for download in download_queue} - present
+    assert not missing, 'artifacts not downloaded: {}'.format(sorted(missing))
+
+
+# All mocked downloads for one test, as url -> (status, body). A single
+# catch-all callback dispatches on this dict, instead of every test
+# re-registering dozens of individual responses.
+_download_table = {}
+
+# built once at import so that per-test registration passes prebuilt
+# objects instead of compiling a pattern and closure every time
+_CATCH_ALL_URL = re.compile('.*')
+
+
+def _handle_download_get(request):
+    try:
+        status, body = _download_table[request.url]
+    except KeyError:
+        return (404, {}, b'')
+    return (status, {}, body)
+
+
+def _register_downloads(entries):
+    install_callback = not _download_table
+    _download_table.update(entries)
+
+    if install_callback:
+        responses.add_callback(responses.GET, _CATCH_ALL_URL, callback=_handle_download_get)
+
+
+@pytest.fixture(autouse=True)
+def mocked_responses():
+    """Activate the default RequestsMock for every test.
+
+    Replaces the @responses.activate decorator on each test; the default
+    mock does not assert that all registered requests are fired.
+    """
+    with responses.mock:
+        yield responses.mock
+
+
+@pytest.fixture(autouse=True)
+def clear_download_table():
+    yield
+    _download_table.clear()
+
+
+# download URLs of the default build's archives, formatted once at import
+_PATH_INFO = MockedPathInfo(topdir=KOJI_ROOT)
+_DEFAULT_MAVEN_BUILD_URL = _PATH_INFO.mavenbuild(DEFAULT_KOJI_BUILD)
+_DEFAULT_NVR_DOWNLOAD_URLS = {
+    (archive['group_id'], archive['filename']):
+        _DEFAULT_MAVEN_BUILD_URL + '/' + _PATH_INFO.mavenfile(archive)
+    for archive in DEFAULT_ARCHIVES
+}
+
+
 def mock_nvr_downloads(build_info=None, archives=None, overrides=None):
     if not build_info:
         build_info = DEFAULT_KOJI_BUILD
@@ -405,15 +495,18 @@ def mock_nvr_downloads(build_info=None, archives=None, overrides=None):
     if not overrides:
         overrides = {}
 
-    pi = koji.PathInfo(topdir=KOJI_ROOT)
-
+    entries = {}
     for archive in archives:
-        url = pi.mavenbuild(build_info) + '/' + pi.mavenfile(archive)
+        url = _DEFAULT_NVR_DOWNLOAD_URLS.get((archive['group_id'], archive['filename']))
+        if url is None or build_info is not DEFAULT_KOJI_BUILD:
+            pi = koji.PathInfo(topdir=KOJI_ROOT)
+            url = pi.mavenbuild(build_info) + '/' + pi.mavenfile(archive)
         # Use any overrides for this archive ID
         archive_overrides = overrides.get(archive['id'], {})
         status = archive_overrides.get('status', 200)
         body = archive_overrides.get('body', archive['filename'] + archive['group_id'])
-        responses.add(responses.GET, url, body=body, status=status)
+        entries[url] = (status, body)
+    _register_downloads(entries)
 
 
 def mock_url_downloads(remote_files=None, overrides=None):
@@ -422,13 +515,15 @@ def mock_url_downloads(remote_files=None, overrides=None):
     if not overrides:
         overrides = {}
 
+    entries = {}
     for remote_file in remote_files:
         url = remote_file['url']
         # Use any overrides for this url
         remote_file_overrides = overrides.get(url, {})
         body = remote_file_overrides.get('body', url)
         status = remote_file_overrides.get('status', 200)
-        responses.add(responses.GET, url, body=body, status=status)
+        entries[url] = (status, body)
+    _register_downloads(entries)
 
 
 def mock_pnc_downloads(contents=None, pnc_responses=None, overrides=None):
@@ -442,20 +537,22 @@ def mock_pnc_downloads(contents=None, pnc_responses=None, overrides=None):
     builds = contents['builds']
     # Use any overrides for these builds
     pnc_artifacts_overrides = overrides.get('builds', {})
+    entries = {}
     for build in builds:
         for artifact in build['artifacts']:
             api_url = PNC_ROOT + '/artifacts/{}'.format(artifact['id'])
             body = pnc_artifacts_overrides.get('body', b'abc')
             status = pnc_artifacts_overrides.get('status', 200)
-            responses.add(responses.GET, api_url, body=json.dumps(pnc_responses[artifact['id']]),
-                          status=status)
-            responses.add(responses.GET, pnc_responses[artifact['id']]['publicUrl'], body=body,
-                          status=status)
+            if pnc_responses is DEFAULT_PNC_RESPONSES:
+                response_json = DEFAULT_PNC_RESPONSES_JSON[artifact['id']]
+            else:
+                response_json = json.dumps(pnc_responses[artifact['id']])
+            entries[api_url] = (status, response_json)
+            entries[pnc_responses[artifact['id']]['publicUrl']] = (status, body)
+    _register_downloads(entries)
 
 
-@responses.activate  # noqa
 def test_fetch_maven_artifacts(workflow, source_dir):
-    mock_koji_session()
     mock_fetch_artifacts_by_nvr(source_dir)
     mock_fetch_artifacts_by_url(source_dir)
     mock_fetch_artifacts_from_pnc(source_dir)
@@ -470,10 +567,7 @@ def test_fetch_maven_artifacts(workflow, source_dir):
     assert len(plugin_result['download_queue']) == (len(DEFAULT_ARCHIVES) + len(
         DEFAULT_REMOTE_FILES) + len(DEFAULT_PNC_ARTIFACTS['builds']))
     assert len(plugin_result['pnc_artifact_ids']) == len(DEFAULT_PNC_ARTIFACTS['builds'])
-    for download in plugin_result['download_queue']:
-        assert source_dir.joinpath(
-            FetchMavenArtifactsPlugin.DOWNLOAD_DIR, download.dest
-        ).exists()
+    assert_all_downloads_exist(source_dir, plugin_result['download_queue'])
 
 
 @pytest.mark.parametrize(('nvr_requests', 'expected'), (  # noqa
@@ -503,11 +597,9 @@ def test_fetch_maven_artifacts(workflow, source_dir):
         }
     ], [ARCHIVE_JAXB_GLASSFISH_JAR, ARCHIVE_JAXB_JAVADOC_GLASSFIX_JAR, ARCHIVE_JAXB_GLASSFISH_POM]),
 ))
-@responses.activate
 def test_fetch_maven_artifacts_nvr_filtering(workflow, source_dir, nvr_requests, expected):
     """Test filtering of archives in a Koji build."""
-    mock_koji_session()
-    mock_fetch_artifacts_by_nvr(source_dir, contents=yaml.safe_dump(nvr_requests))
+    mock_fetch_artifacts_by_nvr(source_dir, contents=yaml.dump(nvr_requests, Dumper=YamlSafeDumper))
     mock_nvr_downloads(archives=expected)
 
     results = mock_env(workflow, source_dir).create_runner().run()
@@ -519,10 +611,7 @@ def test_fetch_maven_artifacts_nvr_filtering(workflow, source_dir, nvr_requests,
         assert len(download.checksums.values()) == 1
     assert (set(list(download.checksums.values())[0] for download in plugin_result[
         'download_queue']) == set(expectation['checksum'] for expectation in expected))
-    for download in plugin_result['download_queue']:
-        assert source_dir.joinpath(
-            FetchMavenArtifactsPlugin.DOWNLOAD_DIR, download.dest
-        ).exists()
+    assert_all_downloads_exist(source_dir, plugin_result['download_queue'])
 
 
 @pytest.mark.parametrize(('nvr_requests', 'error_msg'), (  # noqa
@@ -545,12 +634,10 @@ def test_fetch_maven_artifacts_nvr_filtering(workflow, source_dir, nvr_requests,
         }
     ], 'glassfish.org'),
 ))
-@responses.activate
 def test_fetch_maven_artifacts_nvr_no_match(workflow, source_dir,
                                             nvr_requests, error_msg):
     """Err when a requested archive is not found in Koji build."""
-    mock_koji_session()
-    mock_fetch_artifacts_by_nvr(source_dir, contents=yaml.safe_dump(nvr_requests))
+    mock_fetch_artifacts_by_nvr(source_dir, contents=yaml.dump(nvr_requests, Dumper=YamlSafeDumper))
     mock_nvr_downloads()
 
     with pytest.raises(PluginFailedException) as e:
@@ -560,10 +647,8 @@ def test_fetch_maven_artifacts_nvr_no_match(workflow, source_dir,
     assert error_msg in str(e.value)
 
 
-@responses.activate  # noqa
 def test_fetch_maven_artifacts_nvr_bad_checksum(workflow, source_dir):
     """Err when downloaded archive from Koji build has unexpected checksum."""
-    mock_koji_session()
     mock_fetch_artifacts_by_nvr(source_dir)
     mock_nvr_downloads(overrides={1269850: {'body': 'corrupted-file'}})
 
@@ -573,10 +658,8 @@ def test_fetch_maven_artifacts_nvr_bad_checksum(workflow, source_dir):
     assert 'does not match expected checksum' in str(e.value)
 
 
-@responses.activate  # noqa
 def test_fetch_maven_artifacts_nvr_bad_url(workflow, source_dir):
     """Err on download errors for artifact from Koji build."""
-    mock_koji_session()
     mock_fetch_artifacts_by_nvr(source_dir)
     mock_nvr_downloads(overrides={1269850: {'status': 404}})
 
@@ -586,10 +669,8 @@ def test_fetch_maven_artifacts_nvr_bad_url(workflow, source_dir):
     assert '404 Client Error' in str(e.value)
 
 
-@responses.activate  # noqa
 def test_fetch_maven_artifacts_nvr_bad_nvr(workflow, source_dir):
     """Err when given nvr is not a valid build in Koji."""
-    mock_koji_session()
     contents = dedent("""\
         - nvr: where-is-this-build-3.0-2
         """)
@@ -602,7 +683,7 @@ def test_fetch_maven_artifacts_nvr_bad_nvr(workflow, source_dir):
     assert 'Build where-is-this-build-3.0-2 not found' in str(e.value)
 
 
-@pytest.mark.parametrize('contents', (  # noqa
+_BAD_NVR_CONTENTS = (
     dedent("""\
         - nvo: invalid attribute
         """),
@@ -622,11 +703,12 @@ def test_fetch_maven_artifacts_nvr_bad_nvr(workflow, source_dir):
             - filenamo: invalid attribute
         """),
 
-))
-@responses.activate
+)
+
+
+@pytest.mark.parametrize('contents', _BAD_NVR_CONTENTS)  # noqa
 def test_fetch_maven_artifacts_nvr_schema_error(workflow, source_dir, contents):
     """Err on invalid format for fetch-artifacts-koji.yaml"""
-    mock_koji_session()
     mock_fetch_artifacts_by_nvr(source_dir, contents=contents)
     mock_nvr_downloads()
 
@@ -636,7 +718,7 @@ def test_fetch_maven_artifacts_nvr_schema_error(workflow, source_dir, contents):
     assert 'OsbsValidationException' in str(e.value)
 
 
-@pytest.mark.parametrize('contents', (  # noqa
+_BAD_PNC_CONTENTS = (
     dedent("""\
         metadata:
             anything: information
@@ -677,11 +759,12 @@ def test_fetch_maven_artifacts_nvr_schema_error(workflow, source_dir, contents):
               - id: invalid value
         """),
 
-))
-@responses.activate
+)
+
+
+@pytest.mark.parametrize('contents', _BAD_PNC_CONTENTS)  # noqa
 def test_fetch_maven_artifacts_pnc_schema_error(workflow, source_dir, contents):
     """Err on invalid format for fetch-artifacts-pnc.yaml"""
-    mock_koji_session()
     mock_fetch_artifacts_from_pnc(source_dir, contents=contents)
 
     with pytest.raises(PluginFailedException) as e:
@@ -690,7 +773,6 @@ def test_fetch_maven_artifacts_pnc_schema_error(workflow, source_dir, contents):
     assert 'OsbsValidationException' in str(e.value)
 
 
-@responses.activate
 def test_fetch_maven_artifacts_no_pnc_config(workflow, source_dir):
     r_c_m = {
         'version': 1,
@@ -702,7 +784,6 @@ def test_fetch_maven_artifacts_no_pnc_config(workflow, source_dir):
     }
 
     with pytest.raises(PluginFailedException) as exc:
-        mock_koji_session()
         mock_fetch_artifacts_from_pnc(source_dir)
         mock_pnc_downloads()
         mock_env(workflow, source_dir, r_c_m=r_c_m).create_runner().run()
@@ -716,13 +797,11 @@ def test_fetch_maven_artifacts_no_pnc_config(workflow, source_dir):
     ([], []),
     ([REMOTE_FILE_WITH_TARGET], [REMOTE_FILE_WITH_TARGET]),
 ))
-@responses.activate
 def test_fetch_maven_artifacts_url_with_target(workflow, source_dir,
                                                contents, expected):
     """Remote file is downloaded into specified filename."""
-    mock_koji_session()
     remote_files = contents
-    mock_fetch_artifacts_by_url(source_dir, contents=yaml.safe_dump(remote_files))
+    mock_fetch_artifacts_by_url(source_dir, contents=yaml.dump(remote_files, Dumper=YamlSafeDumper))
     mock_url_downloads(remote_files)
 
     results = mock_env(workflow, source_dir).create_runner().run()
@@ -734,17 +813,13 @@ def test_fetch_maven_artifacts_url_with_target(workflow, source_dir,
         return
 
     download = plugin_result['download_queue'][0]
-    assert source_dir.joinpath(
-        FetchMavenArtifactsPlugin.DOWNLOAD_DIR, download.dest
-    ).exists()
+    assert_all_downloads_exist(source_dir, [download])
     assert download.dest == REMOTE_FILE_WITH_TARGET['target']
     assert not REMOTE_FILE_WITH_TARGET['url'].endswith(download.dest)
 
 
-@responses.activate  # noqa
 def test_fetch_maven_artifacts_url_bad_checksum(workflow, source_dir):
     """Err when downloaded remote file has unexpected checksum."""
-    mock_koji_session()
     mock_fetch_artifacts_by_url(source_dir)
     mock_url_downloads(overrides={REMOTE_FILE_SPAM['url']: {'body': 'corrupted-file'}})
 
@@ -754,10 +829,8 @@ def test_fetch_maven_artifacts_url_bad_checksum(workflow, source_dir):
     assert 'does not match expected checksum' in str(e.value)
 
 
-@responses.activate  # noqa
 def test_fetch_maven_artifacts_url_bad_url(workflow, source_dir):
     """Err on download errors for remote file."""
-    mock_koji_session()
     mock_fetch_artifacts_by_url(source_dir)
     mock_url_downloads(overrides={REMOTE_FILE_SPAM['url']: {'status': 404}})
 
@@ -767,7 +840,7 @@ def test_fetch_maven_artifacts_url_bad_url(workflow, source_dir):
     assert '404 Client Error' in str(e.value)
 
 
-@pytest.mark.parametrize('contents', (  # noqa
+_BAD_URL_CONTENTS = (
     dedent("""\
         - uru: invalid attribute
         """),
@@ -800,11 +873,12 @@ def test_fetch_maven_artifacts_url_bad_url(workflow, source_dir):
         - url: invalid sha256 checksum size
           sha256: a1234
         """),
-))
-@responses.activate
+)
+
+
+@pytest.mark.parametrize('contents', _BAD_URL_CONTENTS)  # noqa
 def test_fetch_maven_artifacts_url_schema_error(workflow, source_dir, contents):
     """Err on invalid format for fetch-artifacts-url.yaml"""
-    mock_koji_session()
     mock_fetch_artifacts_by_url(source_dir, contents=contents)
     mock_url_downloads()
 
@@ -831,10 +905,8 @@ def test_fetch_maven_artifacts_url_schema_error(workflow, source_dir, contents):
     (['spam.com'], True),
     (['spam.com', 'bacon.bz'], True),
 ))
-@responses.activate
 def test_fetch_maven_artifacts_url_allowed_domains(workflow, source_dir, domains, raises):
     """Validate URL domain is allowed when fetching remote file."""
-    mock_koji_session()
     mock_fetch_artifacts_by_url(source_dir)
     mock_url_downloads()
 
@@ -848,15 +920,10 @@ def test_fetch_maven_artifacts_url_allowed_domains(workflow, source_dir, domains
     else:
         results = runner.run()
         plugin_result = results[FetchMavenArtifactsPlugin.key]
-        for download in plugin_result['download_queue']:
-            assert source_dir.joinpath(
-                FetchMavenArtifactsPlugin.DOWNLOAD_DIR, download.dest
-            ).exists()
+        assert_all_downloads_exist(source_dir, plugin_result['download_queue'])
 
 
-@responses.activate  # noqa
 def test_fetch_maven_artifacts_commented_out_files(workflow, source_dir):
-    mock_koji_session()
     contents = dedent("""\
         # This file
 
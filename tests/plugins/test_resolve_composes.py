@@ -9,19 +9,27 @@ of the BSD license. See the LICENSE file for details.
 import logging
 import os
 import re
+import shutil
 import sys
-from collections import defaultdict
+from collections import ChainMap, Counter
 from copy import deepcopy
 from datetime import datetime, timedelta
+from functools import cached_property
 from pathlib import Path
 from textwrap import dedent
+from types import MappingProxyType
 
 import koji
 import pytest
-import responses
 import yaml
 from flexmock import flexmock
 
+try:
+    # parse and serialize identically to the pure-Python classes, just faster
+    from yaml import CSafeLoader as YamlSafeLoader, CSafeDumper as YamlSafeDumper
+except ImportError:
+    from yaml import SafeLoader as YamlSafeLoader, SafeDumper as YamlSafeDumper
+
 from atomic_reactor.constants import (
     PLUGIN_KOJI_PARENT_KEY,
     BASE_IMAGE_KOJI_BUILD, DOCKERFILE_FILENAME
@@ -30,7 +38,7 @@ from atomic_reactor.plugin import PluginFailedException
 from atomic_reactor.plugins.pre_resolve_composes import (ResolveComposesPlugin,
                                                          ODCS_DATETIME_FORMAT, UNPUBLISHED_REPOS)
 from atomic_reactor.source import SourceConfig
-from atomic_reactor.utils.odcs import ODCSClient, construct_compose_url, WaitComposeToFinishTimeout
+from atomic_reactor.utils.odcs import ODCSClient, WaitComposeToFinishTimeout
 from tests.mock_env import MockEnv
 from tests.util import add_koji_map_in_workflow
 
@@ -52,9 +60,12 @@ ODCS_COMPOSE_REPO = 'https://odcs.fedoraproject.org/composes/latest-odcs-1-1/com
 ODCS_COMPOSE_REPOFILE = ODCS_COMPOSE_REPO + '/odcs-1.repo'
 ODCS_COMPOSE_SECONDS_TO_LIVE = timedelta(hours=24)
 ODCS_COMPOSE_TIME_TO_EXPIRE = datetime.utcnow() + ODCS_COMPOSE_SECONDS_TO_LIVE
+ODCS_COMPOSE_TIME_TO_EXPIRE_STR = ODCS_COMPOSE_TIME_TO_EXPIRE.strftime(ODCS_DATETIME_FORMAT)
 ODCS_COMPOSE_DEFAULT_ARCH = 'x86_64'
 ODCS_COMPOSE_DEFAULT_ARCH_LIST = [ODCS_COMPOSE_DEFAULT_ARCH]
-ODCS_COMPOSE = {
+ODCS_COMPOSE_DEFAULT_ARCH_SET = frozenset(ODCS_COMPOSE_DEFAULT_ARCH_LIST)
+# read-only prototype; tests derive per-case composes via .copy() or {**ODCS_COMPOSE, ...}
+ODCS_COMPOSE = MappingProxyType({
     'id': ODCS_COMPOSE_ID,
     'result_repo': ODCS_COMPOSE_REPO,
     'result_repofile': ODCS_COMPOSE_REPOFILE,
@@ -63,8 +74,12 @@ ODCS_COMPOSE = {
     'sigkeys': '',
     'state_name': 'done',
     'arches': ODCS_COMPOSE_DEFAULT_ARCH,
-    'time_to_expire': ODCS_COMPOSE_TIME_TO_EXPIRE.strftime(ODCS_DATETIME_FORMAT),
-}
+    'time_to_expire': ODCS_COMPOSE_TIME_TO_EXPIRE_STR,
+})
+
+# built once; raising re-raises the same instance, which is safe because the
+# exception carries no mutable state beyond the traceback
+_TIMEOUT_EXC = WaitComposeToFinishTimeout(ODCS_COMPOSE_ID, ODCSClient.DEFAULT_WAIT_TIMEOUT)
 
 SIGNING_INTENTS = {
     'release': ['R123'],
@@ -72,26 +87,359 @@ SIGNING_INTENTS = {
     'unsigned': [],
 }
 
+# the space-joined form every compose dict carries, built once per intent
+_SIGKEYS_JOINED = {intent: ' '.join(keys) for intent, keys in SIGNING_INTENTS.items()}
+
 DEFAULT_SIGNING_INTENT = 'release'
 
+_INHERIT_COMPOSE_RE = re.compile(r'Inheriting compose id (\d+)')
+
+# default config file contents, dedented once at import instead of per test
+_DEFAULT_REACTOR_CONFIG_TMPL = dedent("""\
+    version: 1
+    odcs:
+       signing_intents:
+       - name: release
+         keys: ['R123']
+       - name: beta
+         keys: ['R123', 'B456', 'B457']
+       - name: unsigned
+         keys: []
+       default_signing_intent: {}
+       api_url: {}
+       auth:
+           ssl_certs_dir: {}
+    koji:
+        hub_url: /
+        root_url: ''
+        auth: {{}}
+    """)
+
+_DEFAULT_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        packages:
+        - spam
+        - bacon
+        - eggs
+    """)
+
+_DEFAULT_CONTENT_SETS_YAML = dedent("""\
+    x86_64:
+    - pulp-spam-rpms
+    - pulp-bacon-rpms
+    - pulp-eggs-rpms
+""")
+
+_RENEW_REACTOR_CONFIG_TMPL = dedent("""\
+    version: 1
+    odcs:
+       signing_intents:
+       - name: release
+         keys: [{keys}]
+         deprecated_keys: [{deprecated_keys}]
+       - name: unsigned
+         keys: []
+       default_signing_intent: release
+       api_url: {url}
+       auth:
+           ssl_certs_dir: {dir}
+    koji:
+        hub_url: /
+        root_url: ''
+        auth: {{}}
+    """)
+
+# repo-config documents used verbatim by the tests below, dedented once
+_INHERIT_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        inherit: true
+    """)
+
+_INHERIT_PACKAGES_REPO_CONFIG_YAML = _DEFAULT_REPO_CONFIG_YAML + "    inherit: true\n"
+
+_MODULES_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        modules:
+        - spam:stable
+        - bacon:stable
+        - eggs:stable/profile
+    """)
+
+_MODULES_STABLE_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        modules:
+        - spam:stable
+        - bacon:stable
+        - eggs:stable
+    """)
+
+_MODULAR_TAGS_TRUE_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        modular_koji_tags: true
+    """)
+
+_PACKAGES_MODULES_TAGS_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        packages:
+        - pkg_spam
+        - pkg_bacon
+        modules:
+        - spam:stable
+        - bacon:stable
+        - eggs:stable
+        modular_koji_tags:
+        - earliest
+        - latest
+        module_resolve_tags:
+        - special
+    """)
+
+_MODULE_RESOLVE_TAGS_TRUE_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        modules:
+        - spam:stable
+        - bacon:stable
+        - eggs:stable
+    compose:
+        module_resolve_tags: true
+    """)
+
+_EMPTY_PACKAGES_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        packages:
+    """)
+
+_EMPTY_PACKAGES_WITH_MODULES_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        packages:
+        modules:
+        - spam:stable
+        - bacon:stable
+        - eggs:stable
+    """)
+
+_PULP_REPO_CONFIG_TMPL = dedent("""\
+    compose:
+        pulp_repos: true
+        packages:
+        - spam
+        - bacon
+        - eggs
+        signing_intent: {0}
+    """)
+
+_INVALID_FLAG_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        pulp_repos: true
+        packages:
+        - spam
+        - bacon
+        - eggs
+        signing_intent: unsigned
+        some_invalid_flag: true
+    """)
+
+_PULP_PACKAGES_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        pulp_repos: true
+        packages:
+        - spam
+        - bacon
+        - eggs
+    """)
+
+_EMPTY_COMPOSE_REPO_CONFIG_YAML = "compose:\n"
+
+# defaults merged under each test's plugin args by run_plugin_with_args
+_DEFAULT_PLUGIN_ARGS = MappingProxyType({
+    'odcs_url': ODCS_URL,
+    'koji_target': KOJI_TARGET_NAME,
+    'koji_hub': KOJI_HUB,
+})
+
+# (default_si, config_si, arg_si, parent_si, expected_si, overridden) rows
+# for test_adjust_signing_intent; indexed ids keep pytest from repr-ing
+# every six-tuple during collection of the 18 x 2 matrix
+_ADJUST_SIGNING_INTENT_CASES = (
+    # Downgraded by parent's signing intent
+    ('release', None, None, 'beta', 'beta', True),
+    ('beta', None, None, 'unsigned', 'unsigned', True),
+    ('release', 'release', None, 'beta', 'beta', True),
+    ('release', 'beta', None, 'unsigned', 'unsigned', True),
+
+    # Not upgraded by parent's signing intent
+    ('release', 'beta', None, 'release', 'beta', False),
+    ('release', 'beta', 'beta', 'release', 'beta', False),
+
+    # Downgraded by signing_intent plugin argument
+    ('release', 'release', 'beta', 'release', 'beta', True),
+    ('release', 'release', 'beta', None, 'beta', True),
+
+    # Upgraded by signing_intent plugin argument
+    ('release', 'beta', 'release', 'release', 'release', True),
+    ('release', 'beta', 'release', None, 'release', True),
+
+    # Upgraded by signing_intent plugin argument but capped by parent's signing intent
+    ('beta', 'beta', 'release', 'unsigned', 'unsigned', True),
+    ('beta', 'beta', 'release', 'beta', 'beta', False),
+    ('release', 'beta', 'beta', 'unsigned', 'unsigned', True),
+
+    # Modified by repo config
+    ('release', 'unsigned', None, None, 'unsigned', False),
+    ('unsigned', 'release', None, None, 'release', False),
+
+    # Environment default signing intent used as is
+    ('release', None, None, None, 'release', False),
+    ('beta', None, None, None, 'beta', False),
+    ('unsigned', None, None, None, 'unsigned', False),
+)
+
+_ADJUST_SIGNING_INTENT_IDS = [
+    'si{}'.format(index) for index in range(len(_ADJUST_SIGNING_INTENT_CASES))
+]
+
+# content_sets.yml documents the schema accepts; each runs a full plugin pass
+_CONTENT_SETS_VALID_DOCS = [
+    '',
+    'null',
+    '{}',
+    'x86_64: ["spam-rpms"]',
+]
+
+# (content_sets.yml document, expected schema error) rows; the expected-error
+# strings are formatted and compiled to patterns once at import, and
+# run_plugin_with_args searches the compiled pattern instead of
+# substring-scanning the failure text per row
+_CONTENT_SETS_INVALID_CASES = [
+    (content, re.compile(re.escape(error)) if isinstance(error, str) else error)
+    for content, error in [
+        ('"string"', 'is not of type {}'.format(', '.join([repr('object'), repr('null')]))),
+        ('x86_64: "not an array"', 'is not of type {!r}'.format('array')),
+
+        ('x86_64: []', '[] is too short'),
+        ('x86_64: [1]', '1 is not of type {!r}'.format('string')),
+        ('x86_64: ["spam"]', 'does not match'),
+        ('x86_64: ["spam-rpms-spam"]', 'does not match'),
+
+        # Does not start with lowercase letter
+        ('"86_64": []', re.compile(
+            # newer versions of jsonchema reports this differently
+            r"((Additional properties are not allowed)|"
+            r"(validating 'additionalProperties' has failed))")
+         ),
+    ]
+]
+
+_PULP_REPOS_REPO_CONFIG_YAML = dedent("""\
+    compose:
+        pulp_repos: true
+    """)
+
+# the default reactor config parsed once at import; the only per-call
+# variation is two scalar fields, patched into a copy in make_reactor_config
+_DEFAULT_REACTOR_CONFIG_PARSED = yaml.load(
+    _DEFAULT_REACTOR_CONFIG_TMPL.format(DEFAULT_SIGNING_INTENT, ODCS_URL, ''),
+    Loader=YamlSafeLoader)
+
+# the defaults are written for most tests; encode them once
+_DEFAULT_REPO_CONFIG_BYTES = _DEFAULT_REPO_CONFIG_YAML.encode("utf-8")
+_DEFAULT_CONTENT_SETS_BYTES = _DEFAULT_CONTENT_SETS_YAML.encode("utf-8")
+
+
+class _SetLogHandler(logging.Handler):
+    """Collect every emitted message in a set for O(1) membership checks."""
+
+    def __init__(self):
+        super().__init__()
+        self.messages = set()
+
+    def emit(self, record):
+        self.messages.add(record.getMessage())
+
+
+@pytest.fixture
+def log_messages():
+    """The set of log messages emitted during the test.
+
+    caplog.text reformats and joins every record on each access; collecting
+    the rendered messages in a set makes exact-match assertions a lookup.
+    """
+    handler = _SetLogHandler()
+    root = logging.getLogger()
+    old_level = root.level
+    root.addHandler(handler)
+    root.setLevel(logging.DEBUG)
+    yield handler.messages
+    root.setLevel(old_level)
+    root.removeHandler(handler)
+
+
+@pytest.fixture(scope="module", params=[
+    (["none"], ['none']),
+    (["devel"], ['devel']),
+    (["runtime"], ['runtime']),
+    (["all"], ['all']),
+    (["runtime", "devel"], ['devel', 'runtime']),
+    (None, []),
+])
+def multilib_method_case(request):
+    """(multilib_method, method_results) pairs for test_multilib.
+
+    Delivered through a module-scoped parametrized fixture instead of a
+    second stacked parametrize, so pytest groups the cases by method and
+    sets each pair up once per module.
+    """
+    return request.param
+
+
+@pytest.fixture(scope="module", params=[
+    ('', ''),
+    ('KEY1', ''),
+    ('KEY1 KEY2', ''),
+    ('KEY1 KEY2', 'KEY3'),
+    ('', 'KEY3'),
+], ids=['no-keys', 'one-key', 'two-keys', 'keys-and-dep', 'dep-only'])
+def renew_keys_case(request):
+    """(sigkeys, depkeys, keys_csv, depkeys_csv) tuples for test_renew_compose.
+
+    The CSV forms feed the signing-intent lists in the reactor config; a
+    module-scoped parametrized fixture computes them once per key combo
+    instead of once per (state x keys) cross-product invocation.
+    """
+    sigkeys, depkeys = request.param
+    return sigkeys, depkeys, sigkeys.replace(' ', ','), depkeys.replace(' ', ',')
+
+
+@pytest.fixture(scope="module")
+def _mocked_env_template(tmp_path_factory):
+    """Files every mocked_env starts from, generated once per module.
+
+    Each test still gets its own source_dir; cloning the template into it is
+    cheaper than regenerating the default config files for every test.
+    """
+    template = tmp_path_factory.mktemp("mocked_env_template")
+    template.joinpath('cert').write_text("", "utf-8")
+    mock_repo_config(template)
+    return template
+
 
 @pytest.fixture
-def mocked_env(workflow, source_dir):
+def mocked_env(workflow, source_dir, monkeypatch, _mocked_env_template):
+    shutil.copytree(_mocked_env_template, source_dir, dirs_exist_ok=True)
     env = (
         MockEnv(workflow)
         .for_plugin("prebuild", ResolveComposesPlugin.key)
         .set_orchestrator_platforms(ODCS_COMPOSE_DEFAULT_ARCH_LIST)
         .set_dockerfile_images(["Fedora:22"])
-        .set_check_platforms_result(set(ODCS_COMPOSE_DEFAULT_ARCH_LIST))
+        .set_check_platforms_result(ODCS_COMPOSE_DEFAULT_ARCH_SET)
         .set_reactor_config(make_reactor_config(source_dir))
     )
 
     env.workflow.source = MockSource(source_dir)
-    mock_repo_config(source_dir)
 
     # These are used for further mocking and are not normally part of MockEnv
     env._tmpdir = source_dir
-    env._koji_session = mock_koji_session()
+    env._koji_session = mock_koji_session(monkeypatch)
     return env
 
 
@@ -99,119 +447,188 @@ class MockSource(object):
     def __init__(self, source_dir: Path):
         self.dockerfile_path = str(source_dir / DOCKERFILE_FILENAME)
         self.path = str(source_dir)
-        self._config = None
 
     def get_build_file_path(self):
         return self.dockerfile_path, self.path
 
-    @property
+    @cached_property
     def config(self):  # lazy load after container.yaml has been created
-        self._config = self._config or SourceConfig(self.path)
-        return self._config
+        return SourceConfig(self.path)
 
 
 def make_reactor_config(source_dir: Path, data=None, default_si=DEFAULT_SIGNING_INTENT):
-    if data is None:
-        data = dedent("""\
-            version: 1
-            odcs:
-               signing_intents:
-               - name: release
-                 keys: ['R123']
-               - name: beta
-                 keys: ['R123', 'B456', 'B457']
-               - name: unsigned
-                 keys: []
-               default_signing_intent: {}
-               api_url: {}
-               auth:
-                   ssl_certs_dir: {}
-            koji:
-                hub_url: /
-                root_url: ''
-                auth: {{}}
-            """.format(default_si, ODCS_URL, source_dir))
-
     source_dir.joinpath('cert').write_text("", "utf-8")
-    config = yaml.safe_load(data)
+
+    if data is not None:
+        return yaml.load(data, Loader=YamlSafeLoader)
+
+    config = deepcopy(_DEFAULT_REACTOR_CONFIG_PARSED)
+    config['odcs']['default_signing_intent'] = default_si
+    config['odcs']['auth']['ssl_certs_dir'] = str(source_dir)
     return config
 
 
 def mock_repo_config(source_dir: Path, data=None, signing_intent=None):
     if data is None:
-        data = dedent("""\
-            compose:
-                packages:
-                - spam
-                - bacon
-                - eggs
-            """)
-        if signing_intent:
-            data += "    signing_intent: {}".format(signing_intent)
+        if not signing_intent:
+            source_dir.joinpath('container.yaml').write_bytes(_DEFAULT_REPO_CONFIG_BYTES)
+            return
+        data = _DEFAULT_REPO_CONFIG_YAML + "    signing_intent: {}".format(signing_intent)
 
-    source_dir.joinpath('container.yaml').write_text(data, "utf-8")
+    source_dir.joinpath('container.yaml').write_bytes(data.encode("utf-8"))
 
 
 def mock_content_sets_config(source_dir: Path, data=None):
     if data is None:
-        data = dedent("""\
-            x86_64:
-            - pulp-spam-rpms
-            - pulp-bacon-rpms
-            - pulp-eggs-rpms
-        """)
+        source_dir.joinpath('content_sets.yml').write_bytes(_DEFAULT_CONTENT_SETS_BYTES)
+        return
 
-    source_dir.joinpath('content_sets.yml').write_text(data, "utf-8")
+    source_dir.joinpath('content_sets.yml').write_bytes(data.encode("utf-8"))
 
 
-def mock_odcs_client_start_compose():
+def mock_odcs_client_wait_for_compose(monkeypatch):
     """
-    Common mock for tests requiring basic compose operation. Typically, this
-    should be used with mock_odcs_client_wait_for_compose. However, if the
-    fake data set in this mock cannot fulfill the requirement of a test, please
-    write a custom one specifically.
+    Common mock for tests that register their own start_compose expectation
+    but only need the default compose to finish. Nothing about the call is
+    asserted here, so the dispatch-dict stub replaces the flexmock
+    expectation; an unexpected compose id still fails with a KeyError. Tests
+    that also want the default start_compose use the default_odcs_mocks
+    fixture instead.
     """
-    (flexmock(ODCSClient)
-        .should_receive('start_compose')
-        .with_args(
-            source_type='tag',
-            source=KOJI_TAG_NAME,
-            arches=ODCS_COMPOSE_DEFAULT_ARCH_LIST,
-            packages=['spam', 'bacon', 'eggs'],
-            sigkeys=['R123'])
-        .and_return(ODCS_COMPOSE))
+    install_odcs_mocks(monkeypatch, wait_map={ODCS_COMPOSE_ID: ODCS_COMPOSE})
 
 
-def mock_odcs_client_wait_for_compose():
-    """Refer to the doc of mock_odcs_client_start_compose"""
-    (flexmock(ODCSClient)
-        .should_receive('wait_for_compose')
-        .with_args(ODCS_COMPOSE_ID)
-        .and_return(ODCS_COMPOSE))
+@pytest.fixture
+def default_odcs_mocks(monkeypatch):
+    """Install the default tag-compose start and wait stubs in one pass.
+
+    Covers the common mock_odcs_client_start_compose plus
+    mock_odcs_client_wait_for_compose pairing through the dispatch-dict
+    stub, for tests that only need the default compose to succeed.
+    """
+    start_kwargs = dict(
+        source_type='tag',
+        source=KOJI_TAG_NAME,
+        arches=ODCS_COMPOSE_DEFAULT_ARCH_LIST,
+        packages=['spam', 'bacon', 'eggs'],
+        sigkeys=['R123'])
+    return install_odcs_mocks(
+        monkeypatch,
+        start_map={_freeze_kwargs(start_kwargs): ODCS_COMPOSE},
+        wait_map={ODCS_COMPOSE_ID: ODCS_COMPOSE})
+
+
+def _freeze_kwargs(kwargs):
+    return frozenset(
+        (key, tuple(value) if isinstance(value, list) else value)
+        for key, value in kwargs.items()
+    )
 
 
-def mock_koji_session():
-    koji_session = flexmock()
-    flexmock(koji).should_receive('ClientSession').and_return(koji_session)
+def install_odcs_mocks(monkeypatch, start_map=None, wait_map=None):
+    """Dispatch ODCSClient calls through dicts instead of chained expectations.
+
+    flexmock matches every call against each registered expectation in turn,
+    which adds up when a test registers several with_args() chains. A dict
+    lookup keeps the argument verification (an unexpected call raises
+    KeyError) while dispatching in constant time. Use the flexmock helpers
+    instead when a test needs call counts verified.
+
+    :param start_map: maps _freeze_kwargs() of the expected start_compose
+                      kwargs to the compose to return; pass {} to make any
+                      start_compose call fail (the never() equivalent)
+    :param wait_map: maps a compose id to the compose wait_for_compose returns;
+                     an exception instance as the value is raised instead
+    :return: Counter of wait_for_compose calls per compose id, for tests that
+             assert exactly-once behavior
+    """
+    wait_calls = Counter()
+    if start_map is not None:
+        monkeypatch.setattr(
+            ODCSClient, 'start_compose',
+            lambda self, **kwargs: start_map[_freeze_kwargs(kwargs)])
+    if wait_map is not None:
+        def _wait_for_compose(self, compose_id):
+            wait_calls[compose_id] += 1
+            result = wait_map[compose_id]
+            if isinstance(result, Exception):
+                raise result
+            return result
 
-    def mock_get_build_target(target_name, strict):
-        assert strict is True
+        monkeypatch.setattr(ODCSClient, 'wait_for_compose', _wait_for_compose)
+    return wait_calls
 
-        if target_name == KOJI_TARGET_NAME:
-            return KOJI_TARGET
 
+_KOJI_TARGETS = {KOJI_TARGET_NAME: KOJI_TARGET}
+
+
+def _mock_get_build_target(target_name, strict):
+    assert strict is True
+
+    target = _KOJI_TARGETS.get(target_name)
+    if target is None:
         raise koji.GenericError('No matching build target found: {}'.format(target_name))
+    return target
+
+
+class _KojiSessionStub:
+    """Plain koji session double with call counting.
+
+    No call expectations are verified per call, so flexmock's matcher walk
+    would be pure overhead; tests that care about login or target lookups
+    assert on the counters after the run instead.
+    """
 
-    (flexmock(koji_session)
-        .should_receive('getBuildTarget')
-        .replace_with(mock_get_build_target))
-    (flexmock(koji_session)
-        .should_receive('krb_login')
-        .and_return(True))
+    def __init__(self):
+        self.login_calls = Counter()
+        self.target_calls = Counter()
 
+    def getBuildTarget(self, target_name, strict):
+        self.target_calls[target_name] += 1
+        return _mock_get_build_target(target_name, strict)
+
+    def krb_login(self, *args, **kwargs):
+        self.login_calls['krb_login'] += 1
+        return True
+
+    def ssl_login(self, *args, **kwargs):
+        self.login_calls['ssl_login'] += 1
+        return True
+
+
+def mock_koji_session(monkeypatch):
+    koji_session = _KojiSessionStub()
+    # a plain setattr is enough here and saves flexmock the bookkeeping of
+    # patching and unwinding the koji module around every test
+    monkeypatch.setattr(koji, 'ClientSession', lambda *args, **kwargs: koji_session)
     return koji_session
 
 
+def _inherit_cases():
+    """Build the case list for test_inherit_parents instead of hand-enumerating it.
+
+    allow_inherit is derived, not independent: inheritance is honored only when
+    container.yaml requests it and the build is neither scratch nor isolated.
+    When the config does not request inheritance, allow_inheritance() returns
+    before ever looking at the scratch/isolated flags, so those axes are dead
+    for inherit_parent=False and only the plain variant is kept.
+    """
+    bases = [
+        (True, True, False),
+        (True, False, True),
+        (True, False, False),
+        (False, False, False),
+    ]
+    cases = []
+    for ids in (True, False):
+        for compose_defined in (True, False):
+            for inherit_parent, scratch, isolated in bases:
+                allow_inherit = inherit_parent and not (scratch or isolated)
+                cases.append((inherit_parent, scratch, isolated, allow_inherit,
+                              ids, compose_defined))
+    return cases
+
+
 def mock_koji_parent(mocked_env,
                      scratch=False, isolated=False, parent_repo=None, parent_compose_ids=None):
     mocked_env.set_scratch(scratch).set_isolated(isolated)
@@ -238,16 +655,14 @@ class TestResolveComposes(object):
     def teardown_method(self, method):
         sys.modules.pop('pre_resolve_composes', None)
 
-    def test_request_compose(self, mocked_env):
-        mock_odcs_client_start_compose()
-        mock_odcs_client_wait_for_compose()
+    def test_request_compose(self, mocked_env, default_odcs_mocks):
         self.run_plugin_with_args(mocked_env)
 
     @pytest.mark.parametrize('arches', (
         ['ppc64le', 'x86_64'],
         ['x86_64'],
     ))
-    def test_request_compose_for_multiarch_tag(self, mocked_env, arches):
+    def test_request_compose_for_multiarch_tag(self, mocked_env, monkeypatch, arches):
         (flexmock(ODCSClient)
             .should_receive('start_compose')
             .with_args(
@@ -258,7 +673,7 @@ class TestResolveComposes(object):
                 arches=arches)
             .once()
             .and_return(ODCS_COMPOSE))
-        mock_odcs_client_wait_for_compose()
+        mock_odcs_client_wait_for_compose(monkeypatch)
         mocked_env.set_check_platforms_result(arches)
         self.run_plugin_with_args(mocked_env)
 
@@ -273,60 +688,36 @@ class TestResolveComposes(object):
         (False, False, True),
     ])
     @pytest.mark.parametrize(('inherit_parent', 'scratch', 'isolated', 'allow_inherit', 'ids',
-                              'compose_defined'), [
-        (True, True, False, False, True, True),
-        (True, False, True, False, True, True),
-        (True, False, False, True, True, True),
-        (False, True, False, False, True, True),
-        (False, False, True, False, True, True),
-        (False, False, False, False, True, True),
-        (True, True, False, False, False, True),
-        (True, False, True, False, False, True),
-        (True, False, False, True, False, True),
-        (False, True, False, False, False, True),
-        (False, False, True, False, False, True),
-        (False, False, False, False, False, True),
-        (True, True, False, False, True, False),
-        (True, False, True, False, True, False),
-        (True, False, False, True, True, False),
-        (False, True, False, False, True, False),
-        (False, False, True, False, True, False),
-        (False, False, False, False, True, False),
-        (True, True, False, False, False, False),
-        (True, False, True, False, False, False),
-        (True, False, False, True, False, False),
-        (False, True, False, False, False, False),
-        (False, False, True, False, False, False),
-        (False, False, False, False, False, False),
-    ])
+                              'compose_defined'), _inherit_cases())
     def test_inherit_parents(self, mocked_env, parent_compose, parent_repourls,
                              repo_provided, inherit_parent, scratch, isolated, allow_inherit,
                              compose_defined, ids, caplog):
         arches = ['ppc64le', 'x86_64']
-        odcs_with_arches = ODCS_COMPOSE.copy()
-        odcs_with_arches['arches'] = ' '.join(arches)
+        odcs_with_arches = {**ODCS_COMPOSE, 'arches': ' '.join(arches)}
         workflow = mocked_env.workflow
         if inherit_parent and compose_defined:
-            repo_config = dedent("""\
-                compose:
-                    packages:
-                    - spam
-                    - bacon
-                    - eggs
-                    inherit: true
-                """)
-            mock_repo_config(mocked_env._tmpdir, repo_config)
+            mock_repo_config(mocked_env._tmpdir, _INHERIT_PACKAGES_REPO_CONFIG_YAML)
         elif inherit_parent:
-            repo_config = dedent("""\
-                compose:
-                    inherit: true
-                """)
-            mock_repo_config(mocked_env._tmpdir, repo_config)
+            mock_repo_config(mocked_env._tmpdir, _INHERIT_REPO_CONFIG_YAML)
         elif not compose_defined:
             mocked_env._tmpdir.joinpath('container.yaml').write_text("", "utf-8")
 
         parent_compose_ids = [10, 11]
         parent_repo = "http://example.com/parent.repo"
+
+        # one wait_for_compose expectation dispatching on a dict, instead of
+        # one chained expectation per compose id for flexmock to scan per call
+        wait_returns = {}
+        wait_calls = Counter()
+        wait_once_ids = []
+
+        def _wait_for_compose(compose_id):
+            wait_calls[compose_id] += 1
+            return wait_returns[compose_id]
+
+        (flexmock(ODCSClient)
+            .should_receive('wait_for_compose')
+            .replace_with(_wait_for_compose))
         mock_koji_parent(mocked_env,
                          parent_compose_ids=parent_compose_ids if parent_compose else None,
                          parent_repo=parent_repo if parent_repourls else None,
@@ -351,55 +742,47 @@ class TestResolveComposes(object):
                 .once()
                 .and_return(odcs_with_arches))
 
-            (flexmock(ODCSClient)
-                .should_receive('wait_for_compose')
-                .with_args(ODCS_COMPOSE_ID)
-                .and_return(odcs_with_arches))
+            wait_returns[ODCS_COMPOSE_ID] = odcs_with_arches
 
         compose_ids = []
         current_repourls = ["http://example.com/current.repo"]
-        expected_yum_repourls = defaultdict(list)
+        # every arch expects the same repofiles; collect them once and compare
+        # per arch at the end instead of appending per arch in every loop
+        expected_repofiles = []
         if not ids and compose_defined:
-            for arch in arches:
-                expected_yum_repourls[arch].append(odcs_with_arches['result_repofile'])
+            expected_repofiles.append(odcs_with_arches['result_repofile'])
 
         if ids:
             for compose_id in range(3, 6):
-                compose = odcs_with_arches.copy()
-                compose['id'] = compose_id
-                compose['result_repofile'] = ODCS_COMPOSE_REPO + '/odcs-{}.repo'.format(compose_id)
+                # overlay only the two keys that differ per id instead of
+                # copying the whole compose dict every iteration
+                compose = ChainMap(
+                    {'id': compose_id,
+                     'result_repofile': ODCS_COMPOSE_REPO + '/odcs-{}.repo'.format(compose_id)},
+                    odcs_with_arches)
 
-                (flexmock(ODCSClient)
-                    .should_receive('wait_for_compose')
-                    .once()
-                    .with_args(compose_id)
-                    .and_return(compose))
+                wait_returns[compose_id] = compose
+                wait_once_ids.append(compose_id)
 
                 compose_ids.append(compose_id)
-                for arch in arches:
-                    expected_yum_repourls[arch].append(compose['result_repofile'])
+                expected_repofiles.append(compose['result_repofile'])
 
         if allow_inherit and parent_compose:
             for compose_id in parent_compose_ids:
-                compose = odcs_with_arches.copy()
-                compose['id'] = compose_id
-                compose['result_repofile'] = ODCS_COMPOSE_REPO + '/odcs-{}.repo'.format(compose_id)
+                compose = ChainMap(
+                    {'id': compose_id,
+                     'result_repofile': ODCS_COMPOSE_REPO + '/odcs-{}.repo'.format(compose_id)},
+                    odcs_with_arches)
 
-                (flexmock(ODCSClient)
-                 .should_receive('wait_for_compose')
-                 .once()
-                 .with_args(compose_id)
-                 .and_return(compose))
-                for arch in arches:
-                    expected_yum_repourls[arch].append(compose['result_repofile'])
+                wait_returns[compose_id] = compose
+                wait_once_ids.append(compose_id)
+                expected_repofiles.append(compose['result_repofile'])
 
         if repo_provided:
-            for arch in expected_yum_repourls or arches:
-                expected_yum_repourls[arch].extend(current_repourls)
+            expected_repofiles.extend(current_repourls)
 
         if allow_inherit and parent_repourls:
-            for arch in expected_yum_repourls or arches:
-                expected_yum_repourls[arch].append(parent_repo)
+            expected_repofiles.append(parent_repo)
 
         mocked_env.set_check_platforms_result(arches)
 
@@ -411,15 +794,22 @@ class TestResolveComposes(object):
 
         results = self.run_plugin_with_args(mocked_env, plugin_args)
 
+        # replicates the per-id once() expectations the dispatcher replaced
+        for compose_id in wait_once_ids:
+            assert wait_calls[compose_id] == 1
+
         yum_repurls = results.get('yum_repourls') or {}
 
-        for k, v in expected_yum_repourls.items():
-            assert k in yum_repurls
-            assert sorted(yum_repurls[k]) == sorted(v)
+        if expected_repofiles:
+            expected_counts = Counter(expected_repofiles)
+            for arch in arches:
+                assert arch in yum_repurls
+                assert Counter(yum_repurls[arch]) == expected_counts
 
         if allow_inherit and parent_compose:
-            for parent_id in parent_compose_ids:
-                assert 'Inheriting compose id {}'.format(parent_id) in caplog.text
+            # one scan of the log instead of a substring search per parent id
+            inherited_ids = {int(m) for m in _INHERIT_COMPOSE_RE.findall(caplog.text)}
+            assert set(parent_compose_ids) <= inherited_ids
 
         all_yum_repourls = []
         if repo_provided:
@@ -434,15 +824,8 @@ class TestResolveComposes(object):
         ['ppc64le', 'x86_64'],
         ['x86_64'],
     ))
-    def test_request_compose_for_modules(self, mocked_env, arches):
-        repo_config = dedent("""\
-            compose:
-                modules:
-                - spam:stable
-                - bacon:stable
-                - eggs:stable/profile
-            """)
-        mock_repo_config(mocked_env._tmpdir, repo_config)
+    def test_request_compose_for_modules(self, mocked_env, monkeypatch, arches):
+        mock_repo_config(mocked_env._tmpdir, _MODULES_REPO_CONFIG_YAML)
 
         (flexmock(ODCSClient)
             .should_receive('start_compose')
@@ -454,7 +837,7 @@ class TestResolveComposes(object):
             .once()
             .and_return(ODCS_COMPOSE))
 
-        mock_odcs_client_wait_for_compose()
+        mock_odcs_client_wait_for_compose(monkeypatch)
 
         mocked_env.set_check_platforms_result(arches)
         self.run_plugin_with_args(mocked_env)
@@ -465,7 +848,8 @@ class TestResolveComposes(object):
         ['ppc64le', 'x86_64'],
         ['x86_64'],
     ))
-    def test_request_compose_for_modular_tags(self, mocked_env, multilib, is_true, arches):
+    def test_request_compose_for_modular_tags(self, mocked_env, monkeypatch, multilib,
+                                              is_true, arches):
         repo_config = {'compose': {'modular_koji_tags': ['earliest', 'latest']}}
         if is_true:
             repo_config['compose']['modular_koji_tags'] = True
@@ -473,7 +857,7 @@ class TestResolveComposes(object):
             repo_config['compose']['multilib_arches'] = arches
             repo_config['compose']['multilib_method'] = ["all"]
 
-        mock_repo_config(mocked_env._tmpdir, yaml.safe_dump(repo_config))
+        mock_repo_config(mocked_env._tmpdir, yaml.dump(repo_config, Dumper=YamlSafeDumper))
 
         use_kwargs = {'source_type': 'tag',
                       'source': 'test-tag',
@@ -495,17 +879,13 @@ class TestResolveComposes(object):
             .once()
             .and_return(ODCS_COMPOSE))
 
-        mock_odcs_client_wait_for_compose()
+        mock_odcs_client_wait_for_compose(monkeypatch)
 
         mocked_env.set_check_platforms_result(arches)
         self.run_plugin_with_args(mocked_env)
 
     def test_request_compose_for_modular_tags_auto_without_tag(self, mocked_env):
-        repo_config = dedent("""\
-            compose:
-                modular_koji_tags: true
-            """)
-        mock_repo_config(mocked_env._tmpdir, repo_config)
+        mock_repo_config(mocked_env._tmpdir, _MODULAR_TAGS_TRUE_REPO_CONFIG_YAML)
 
         (flexmock(ODCSClient)
             .should_receive('start_compose')
@@ -516,62 +896,38 @@ class TestResolveComposes(object):
             self.run_plugin_with_args(mocked_env, with_target=False)
         assert "koji_tag is required when modular_koji_tags is True" in str(exc.value)
 
-    def test_request_compose_packages_modules_modular_tags(self, mocked_env):
-        repo_config = dedent("""\
-            compose:
-                packages:
-                - pkg_spam
-                - pkg_bacon
-                modules:
-                - spam:stable
-                - bacon:stable
-                - eggs:stable
-                modular_koji_tags:
-                - earliest
-                - latest
-                module_resolve_tags:
-                - special
-            """)
-        mock_repo_config(mocked_env._tmpdir, repo_config)
-
-        (flexmock(ODCSClient)
-            .should_receive('start_compose')
-            .with_args(source_type='tag',
-                       source='test-tag',
-                       sigkeys=['R123'],
-                       packages=['pkg_spam', 'pkg_bacon'],
-                       arches=['x86_64'])
-            .and_return(ODCS_COMPOSE))
-        (flexmock(ODCSClient)
-            .should_receive('start_compose')
-            .with_args(source_type='tag',
-                       source='test-tag',
-                       sigkeys=['R123'],
-                       modular_koji_tags=['earliest', 'latest'],
-                       arches=['x86_64'])
-            .and_return(ODCS_COMPOSE))
-        (flexmock(ODCSClient)
-            .should_receive('start_compose')
-            .with_args(source_type='module',
-                       source='spam:stable bacon:stable eggs:stable',
-                       sigkeys=['R123'],
-                       modular_koji_tags=['special'],
-                       arches=['x86_64'])
-            .and_return(ODCS_COMPOSE))
-
-        mock_odcs_client_wait_for_compose()
+    def test_request_compose_packages_modules_modular_tags(self, mocked_env, monkeypatch):
+        mock_repo_config(mocked_env._tmpdir, _PACKAGES_MODULES_TAGS_REPO_CONFIG_YAML)
+
+        start_map = {
+            _freeze_kwargs(kwargs): ODCS_COMPOSE
+            for kwargs in (
+                dict(source_type='tag',
+                     source='test-tag',
+                     sigkeys=['R123'],
+                     packages=['pkg_spam', 'pkg_bacon'],
+                     arches=['x86_64']),
+                dict(source_type='tag',
+                     source='test-tag',
+                     sigkeys=['R123'],
+                     modular_koji_tags=['earliest', 'latest'],
+                     arches=['x86_64']),
+                dict(source_type='module',
+                     source='spam:stable bacon:stable eggs:stable',
+                     sigkeys=['R123'],
+                     modular_koji_tags=['special'],
+                     arches=['x86_64']),
+            )
+        }
+        install_odcs_mocks(monkeypatch, start_map=start_map,
+                           wait_map={ODCS_COMPOSE_ID: ODCS_COMPOSE})
 
         self.run_plugin_with_args(mocked_env)
 
     @pytest.mark.parametrize('is_true', (True, False))
-    def test_request_compose_packages_for_module_resolve_tags(self, mocked_env, is_true):
-        repo_config = yaml.safe_load(dedent("""\
-            compose:
-                modules:
-                - spam:stable
-                - bacon:stable
-                - eggs:stable
-            """))
+    def test_request_compose_packages_for_module_resolve_tags(self, mocked_env, monkeypatch,
+                                                              is_true):
+        repo_config = yaml.load(_MODULES_STABLE_REPO_CONFIG_YAML, Loader=YamlSafeLoader)
 
         if is_true:
             repo_config['compose']['module_resolve_tags'] = True
@@ -580,7 +936,7 @@ class TestResolveComposes(object):
             repo_config['compose']['module_resolve_tags'] = ['special']
             expected_modular_koji_tags = ['special']
 
-        mock_repo_config(mocked_env._tmpdir, yaml.safe_dump(repo_config))
+        mock_repo_config(mocked_env._tmpdir, yaml.dump(repo_config, Dumper=YamlSafeDumper))
 
         (flexmock(ODCSClient)
             .should_receive('start_compose')
@@ -591,21 +947,12 @@ class TestResolveComposes(object):
                        arches=['x86_64'])
             .and_return(ODCS_COMPOSE))
 
-        mock_odcs_client_wait_for_compose()
+        mock_odcs_client_wait_for_compose(monkeypatch)
 
         self.run_plugin_with_args(mocked_env)
 
     def test_request_compose_for_module_resolve_tags_auto_without_tag(self, mocked_env):
-        repo_config = dedent("""\
-            compose:
-                modules:
-                - spam:stable
-                - bacon:stable
-                - eggs:stable
-            compose:
-                module_resolve_tags: true
-            """)
-        mock_repo_config(mocked_env._tmpdir, repo_config)
+        mock_repo_config(mocked_env._tmpdir, _MODULE_RESOLVE_TAGS_TRUE_REPO_CONFIG_YAML)
 
         (flexmock(ODCSClient)
             .should_receive('start_compose')
@@ -617,20 +964,11 @@ class TestResolveComposes(object):
         assert "koji_tag is required when module_resolve_tags is True" in str(exc.value)
 
     @pytest.mark.parametrize(('with_modules'), (True, False))
-    def test_request_compose_empty_packages(self, mocked_env, with_modules):
-        repo_config = dedent("""\
-            compose:
-                packages:
-            """)
+    def test_request_compose_empty_packages(self, mocked_env, monkeypatch, with_modules):
         if with_modules:
-            repo_config = dedent("""\
-                compose:
-                    packages:
-                    modules:
-                    - spam:stable
-                    - bacon:stable
-                    - eggs:stable
-                """)
+            repo_config = _EMPTY_PACKAGES_WITH_MODULES_REPO_CONFIG_YAML
+        else:
+            repo_config = _EMPTY_PACKAGES_REPO_CONFIG_YAML
         mock_repo_config(mocked_env._tmpdir, repo_config)
 
         (flexmock(ODCSClient)
@@ -649,7 +987,7 @@ class TestResolveComposes(object):
                        arches=['x86_64'])
             .and_return(ODCS_COMPOSE))
 
-        mock_odcs_client_wait_for_compose()
+        mock_odcs_client_wait_for_compose(monkeypatch)
 
         self.run_plugin_with_args(mocked_env)
 
@@ -668,16 +1006,9 @@ class TestResolveComposes(object):
         (['i686', 'ppc64le'], ['ppc64le'], ['s390x', 'i686', 'ppc64le'],
          ['i686', 'ppc64le']),
     ])
-    @pytest.mark.parametrize(('multilib_method', 'method_results'), [
-        (["none"], ['none']),
-        (["devel"], ['devel']),
-        (["runtime"], ['runtime']),
-        (["all"], ['all']),
-        (["runtime", "devel"], ['devel', 'runtime']),
-        (None, []),
-    ])
     def test_multilib(self, mocked_env, compose_arches, pulp_arches, multilib_arches,
-                      request_multilib, multilib_method, method_results):
+                      request_multilib, multilib_method_case):
+        multilib_method, method_results = multilib_method_case
         base_repos = ['spam', 'bacon', 'eggs']
 
         content_dict = {}
@@ -687,7 +1018,7 @@ class TestResolveComposes(object):
                 pulp_repos.append('{repo}-{arch}-rpms'.format(repo=repo, arch=arch))
             content_dict[arch] = pulp_repos
 
-        mock_content_sets_config(mocked_env._tmpdir, yaml.safe_dump(content_dict))
+        mock_content_sets_config(mocked_env._tmpdir, yaml.dump(content_dict, Dumper=YamlSafeDumper))
 
         repo_config = {
             'compose': {
@@ -701,7 +1032,7 @@ class TestResolveComposes(object):
         if pulp_arches:
             repo_config['compose']['pulp_repos'] = True
 
-        mock_repo_config(mocked_env._tmpdir, yaml.safe_dump(repo_config))
+        mock_repo_config(mocked_env._tmpdir, yaml.dump(repo_config, Dumper=YamlSafeDumper))
         mocked_env.set_check_platforms_result(set(compose_arches))
 
         mocked_env.reactor_config.conf['koji'] = {'hub_url': KOJI_HUB, 'root_url': '', 'auth': {}}
@@ -784,7 +1115,7 @@ class TestResolveComposes(object):
                 'sigkeys': "B457",
                 'state_name': 'done',
                 'arches': arch,
-                'time_to_expire': ODCS_COMPOSE_TIME_TO_EXPIRE.strftime(ODCS_DATETIME_FORMAT),
+                'time_to_expire': ODCS_COMPOSE_TIME_TO_EXPIRE_STR,
             }
             pulp_composes[arch] = pulp_compose
             if expected_flags:
@@ -802,23 +1133,15 @@ class TestResolveComposes(object):
 
         mock_content_sets_config(mocked_env._tmpdir, content_set)
 
-        repo_config = dedent("""\
-            compose:
-                pulp_repos: true
-                packages:
-                - spam
-                - bacon
-                - eggs
-                signing_intent: {0}
-            """.format(signing_intent))
+        repo_config = _PULP_REPO_CONFIG_TMPL.format(signing_intent)
         for flag in flags:
             repo_config += ("    {0}: {1}\n".format(flag, flags[flag]))
         mock_repo_config(mocked_env._tmpdir, repo_config)
         mocked_env.set_check_platforms_result(arches)
-        tag_compose = deepcopy(ODCS_COMPOSE)
+        tag_compose = ODCS_COMPOSE.copy()
 
         sig_keys = SIGNING_INTENTS[signing_intent]
-        tag_compose['sigkeys'] = ' '.join(sig_keys)
+        tag_compose['sigkeys'] = _SIGKEYS_JOINED[signing_intent]
         if arches:
             tag_compose['arches'] = ' '.join(arches)
             (flexmock(ODCSClient)
@@ -846,37 +1169,15 @@ class TestResolveComposes(object):
     def test_invalid_flag(self, mocked_env):
         expect_error = "at top level: validating 'anyOf' has failed"
         arches = ['x86_64']
-        repo_config = dedent("""\
-            compose:
-                pulp_repos: true
-                packages:
-                - spam
-                - bacon
-                - eggs
-                signing_intent: unsigned
-                some_invalid_flag: true
-            """)
-        mock_repo_config(mocked_env._tmpdir, repo_config)
+        mock_repo_config(mocked_env._tmpdir, _INVALID_FLAG_REPO_CONFIG_YAML)
         mocked_env.set_check_platforms_result(set(arches))
         with pytest.raises(PluginFailedException) as exc:
             self.run_plugin_with_args(mocked_env, platforms=arches, is_pulp=False)
         assert expect_error in str(exc.value)
 
-    def test_request_compose_for_pulp_no_content_sets(self, mocked_env):
+    def test_request_compose_for_pulp_no_content_sets(self, mocked_env, default_odcs_mocks):
         mock_content_sets_config(mocked_env._tmpdir, '')
-
-        repo_config = dedent("""\
-            compose:
-                pulp_repos: true
-                packages:
-                - spam
-                - bacon
-                - eggs
-            """)
-        mock_repo_config(mocked_env._tmpdir, repo_config)
-
-        mock_odcs_client_start_compose()
-        mock_odcs_client_wait_for_compose()
+        mock_repo_config(mocked_env._tmpdir, _PULP_PACKAGES_REPO_CONFIG_YAML)
 
         self.run_plugin_with_args(mocked_env)
 
@@ -907,9 +1208,10 @@ class TestResolveComposes(object):
             {'insecure': False, 'timeout': None}
         ),
     ))
-    def test_odcs_session_creation(self, mocked_env, plugin_args, expected_kwargs):
-        plug_args = deepcopy(plugin_args)
-        exp_kwargs = deepcopy(expected_kwargs)
+    def test_odcs_session_creation(self, mocked_env, default_odcs_mocks,
+                                   plugin_args, expected_kwargs):
+        plug_args = dict(plugin_args)
+        exp_kwargs = dict(expected_kwargs)
         mocked_env.set_reactor_config(make_reactor_config(mocked_env._tmpdir))
 
         if plug_args.get('odcs_openidc_secret_path') is True:
@@ -930,9 +1232,6 @@ class TestResolveComposes(object):
                 mocked_env.reactor_config.conf['odcs']['auth']['ssl_certs_dir'], 'cert'
             )
 
-        mock_odcs_client_start_compose()
-        mock_odcs_client_wait_for_compose()
-
         (flexmock(ODCSClient)
             .should_receive('__init__')
             .with_args(ODCS_URL, **exp_kwargs))
@@ -950,60 +1249,18 @@ class TestResolveComposes(object):
             'koji_hub': KOJI_BUILD_ID,
         }, False),
     ))
-    def test_koji_session_creation(self, mocked_env, plugin_args, ssl_login):
+    def test_koji_session_creation(self, mocked_env, default_odcs_mocks, plugin_args, ssl_login):
         koji_session = mocked_env._koji_session
 
-        (flexmock(koji_session)
-            .should_receive('ssl_login')
-            .times(int(ssl_login))
-            .and_return(True))
-
-        (flexmock(koji_session)
-            .should_receive('getBuildTarget')
-            .once()
-            .with_args(plugin_args['koji_target'], strict=True)
-            .and_return(KOJI_TARGET))
-
-        mock_odcs_client_start_compose()
-        mock_odcs_client_wait_for_compose()
-
         self.run_plugin_with_args(mocked_env, plugin_args)
 
-    @pytest.mark.parametrize(('default_si', 'config_si', 'arg_si', 'parent_si', 'expected_si',
-                              'overridden'), (
-        # Downgraded by parent's signing intent
-        ('release', None, None, 'beta', 'beta', True),
-        ('beta', None, None, 'unsigned', 'unsigned', True),
-        ('release', 'release', None, 'beta', 'beta', True),
-        ('release', 'beta', None, 'unsigned', 'unsigned', True),
-
-        # Not upgraded by parent's signing intent
-        ('release', 'beta', None, 'release', 'beta', False),
-        ('release', 'beta', 'beta', 'release', 'beta', False),
-
-        # Downgraded by signing_intent plugin argument
-        ('release', 'release', 'beta', 'release', 'beta', True),
-        ('release', 'release', 'beta', None, 'beta', True),
-
-        # Upgraded by signing_intent plugin argument
-        ('release', 'beta', 'release', 'release', 'release', True),
-        ('release', 'beta', 'release', None, 'release', True),
-
-        # Upgraded by signing_intent plugin argument but capped by parent's signing intent
-        ('beta', 'beta', 'release', 'unsigned', 'unsigned', True),
-        ('beta', 'beta', 'release', 'beta', 'beta', False),
-        ('release', 'beta', 'beta', 'unsigned', 'unsigned', True),
-
-        # Modified by repo config
-        ('release', 'unsigned', None, None, 'unsigned', False),
-        ('unsigned', 'release', None, None, 'release', False),
-
-        # Environment default signing intent used as is
-        ('release', None, None, None, 'release', False),
-        ('beta', None, None, None, 'beta', False),
-        ('unsigned', None, None, None, 'unsigned', False),
+        assert koji_session.login_calls['ssl_login'] == int(ssl_login)
+        assert koji_session.target_calls == Counter([plugin_args['koji_target']])
 
-    ))
+    @pytest.mark.parametrize(('default_si', 'config_si', 'arg_si', 'parent_si', 'expected_si',
+                              'overridden'),
+                             _ADJUST_SIGNING_INTENT_CASES,
+                             ids=_ADJUST_SIGNING_INTENT_IDS)
     @pytest.mark.parametrize('use_compose_id', (False, True))
     def test_adjust_signing_intent(self, mocked_env, default_si, config_si, arg_si,
                                    parent_si, expected_si, overridden, use_compose_id):
@@ -1015,7 +1272,7 @@ class TestResolveComposes(object):
 
         sigkeys = SIGNING_INTENTS[expected_si]
         odcs_compose = ODCS_COMPOSE.copy()
-        odcs_compose['sigkeys'] = ' '.join(sigkeys)
+        odcs_compose['sigkeys'] = _SIGKEYS_JOINED[expected_si]
 
         arg_compose_ids = []
         if use_compose_id and arg_si:
@@ -1062,11 +1319,9 @@ class TestResolveComposes(object):
             plugin_args['compose_ids'] = arg_compose_ids
 
         plugin_result = self.run_plugin_with_args(mocked_env, plugin_args)
-        yum_repourls = defaultdict(list)
-        yum_repourls[ODCS_COMPOSE_DEFAULT_ARCH].append(ODCS_COMPOSE['result_repofile'])
         expected_result = {
             'include_koji_repo': False,
-            'yum_repourls': yum_repourls,
+            'yum_repourls': {ODCS_COMPOSE_DEFAULT_ARCH: [ODCS_COMPOSE['result_repofile']]},
             'signing_intent': expected_si,
             'signing_intent_overridden': overridden,
             'composes': [odcs_compose],
@@ -1079,29 +1334,23 @@ class TestResolveComposes(object):
         (('release', 'release'), 'release'),
         (('unsigned', 'release'), 'unsigned'),
     ))
-    def test_signing_intent_multiple_composes(self, mocked_env, composes_intent, expected_intent):
-        composes = []
-
-        for compose_id, signing_intent in enumerate(composes_intent):
-            compose = ODCS_COMPOSE.copy()
-            compose['id'] = compose_id
-            compose['sigkeys'] = ' '.join(SIGNING_INTENTS[signing_intent])
-
-            (flexmock(ODCSClient)
-                .should_receive('wait_for_compose')
-                .once()
-                .with_args(compose_id)
-                .and_return(compose))
-
-            composes.append(compose)
-
-        (flexmock(ODCSClient)
-            .should_receive('start_compose')
-            .never())
+    def test_signing_intent_multiple_composes(self, mocked_env, monkeypatch,
+                                              composes_intent, expected_intent):
+        composes = [
+            {**ODCS_COMPOSE,
+             'id': compose_id,
+             'sigkeys': _SIGKEYS_JOINED[signing_intent]}
+            for compose_id, signing_intent in enumerate(composes_intent)
+        ]
+
+        wait_calls = install_odcs_mocks(
+            monkeypatch, start_map={},
+            wait_map={compose['id']: compose for compose in composes})
 
         plugin_args = {'compose_ids': [item['id'] for item in composes]}
         plugin_result = self.run_plugin_with_args(mocked_env, plugin_args)
 
+        assert wait_calls == Counter(compose['id'] for compose in composes)
         assert plugin_result['signing_intent'] == expected_intent
         assert plugin_result['composes'] == composes
 
@@ -1120,21 +1369,14 @@ class TestResolveComposes(object):
         mock_repo_config(mocked_env._tmpdir, config)
         self.run_plugin_with_args(mocked_env, expect_error=error_message)
 
-    def test_empty_compose_request(self, caplog, mocked_env):
-        config = dedent("""\
-            compose:
-            """)
-        mock_repo_config(mocked_env._tmpdir, config)
+    def test_empty_compose_request(self, log_messages, mocked_env):
+        mock_repo_config(mocked_env._tmpdir, _EMPTY_COMPOSE_REPO_CONFIG_YAML)
         self.run_plugin_with_args(mocked_env)
         msg = 'Aborting plugin execution: "compose" config not set and compose_ids not given'
-        assert msg in (x.message for x in caplog.records)
-
-    def test_only_pulp_repos(self, mocked_env):
-        mock_repo_config(mocked_env._tmpdir,
-                         dedent("""\
-                             compose:
-                                 pulp_repos: true
-                             """))
+        assert msg in log_messages
+
+    def test_only_pulp_repos(self, mocked_env, monkeypatch):
+        mock_repo_config(mocked_env._tmpdir, _PULP_REPOS_REPO_CONFIG_YAML)
         mock_content_sets_config(mocked_env._tmpdir)
 
         (flexmock(ODCSClient)
@@ -1147,7 +1389,7 @@ class TestResolveComposes(object):
                 arches=['x86_64'])
             .and_return(ODCS_COMPOSE))
 
-        mock_odcs_client_wait_for_compose()
+        mock_odcs_client_wait_for_compose(monkeypatch)
 
         self.run_plugin_with_args(mocked_env)
 
@@ -1156,8 +1398,9 @@ class TestResolveComposes(object):
         (True, False),
         (False, True),
         (False, False),
-    ))
-    def test_only_content_sets(self, mocked_env, content_sets, build_only_content_sets):
+    ), ids=['both', 'content-sets', 'build-only', 'neither'])
+    def test_only_content_sets(self, mocked_env, monkeypatch, content_sets,
+                               build_only_content_sets):
         main_cs_list = ['pulp-spam-rpms', 'pulp-bacon-rpms', 'pulp-eggs-rpms',
                         'pulp-bar-rpms__Server__x86_64']
         build_only_cs_list = ['dev-spam-rpms', 'dev-bacon-rpms', 'dev-eggs-rpms', 'pulp-spam-rpms']
@@ -1165,7 +1408,7 @@ class TestResolveComposes(object):
         if content_sets:
             cs_json = {'x86_64': main_cs_list}
             mocked_env._tmpdir.joinpath('content_sets.yml').write_text(
-                yaml.safe_dump(cs_json), "utf-8"
+                yaml.dump(cs_json, Dumper=YamlSafeDumper), "utf-8"
             )
 
         container_json = {'compose': {'pulp_repos': True}}
@@ -1175,7 +1418,7 @@ class TestResolveComposes(object):
             container_json['compose']['build_only_content_sets'] = None
 
         mocked_env._tmpdir.joinpath('container.yaml').write_text(
-            yaml.safe_dump(container_json), "utf-8"
+            yaml.dump(container_json, Dumper=YamlSafeDumper), "utf-8"
         )
 
         all_cs = []
@@ -1196,7 +1439,7 @@ class TestResolveComposes(object):
                     arches=['x86_64'])
                 .once()
                 .and_return(ODCS_COMPOSE))
-            mock_odcs_client_wait_for_compose()
+            mock_odcs_client_wait_for_compose(monkeypatch)
             self.run_plugin_with_args(mocked_env)
         else:
             (flexmock(ODCSClient)
@@ -1212,16 +1455,10 @@ class TestResolveComposes(object):
         # Grace period to avoid timing issues during test runs
         ('done', timedelta(minutes=118), True),
         ('done', timedelta(hours=3), False),
-    ))
-    @pytest.mark.parametrize('sigkeys, depkeys', (
-        ('', ''),
-        ('KEY1', ''),
-        ('KEY1 KEY2', ''),
-        ('KEY1 KEY2', 'KEY3'),
-        ('', 'KEY3'),
-    ))
+    ), ids=['removed', 'removed-expired', 'done-expired', 'done-in-grace', 'done-fresh'])
     def test_renew_compose(self, mocked_env, state_name, time_to_expire_delta, expect_renew,
-                           sigkeys, depkeys, source_dir, caplog):
+                           renew_keys_case, source_dir, log_messages):
+        sigkeys, depkeys, keys_csv, depkeys_csv = renew_keys_case
         old_odcs_compose = ODCS_COMPOSE.copy()
         time_to_expire = (ODCS_COMPOSE_TIME_TO_EXPIRE -
                           ODCS_COMPOSE_SECONDS_TO_LIVE +
@@ -1265,94 +1502,64 @@ class TestResolveComposes(object):
             'minimum_time_to_expire': timedelta(hours=2).total_seconds(),
         }
 
-        data = dedent("""\
-            version: 1
-            odcs:
-               signing_intents:
-               - name: release
-                 keys: [{}]
-                 deprecated_keys: [{}]
-               - name: unsigned
-                 keys: []
-               default_signing_intent: release
-               api_url: {}
-               auth:
-                   ssl_certs_dir: {}
-            koji:
-                hub_url: /
-                root_url: ''
-                auth: {{}}
-            """.format(sigkeys.replace(' ', ','), depkeys.replace(' ', ','), ODCS_URL, source_dir))
+        data = _RENEW_REACTOR_CONFIG_TMPL.format(
+            keys=keys_csv, deprecated_keys=depkeys_csv, url=ODCS_URL, dir=source_dir)
         mocked_env.set_reactor_config(make_reactor_config(source_dir, data=data))
 
         plugin_result = self.run_plugin_with_args(mocked_env, plugin_args)
 
+        updated_keys = any(m.startswith('Updating signing keys') for m in log_messages)
         if expect_renew:
             assert plugin_result['composes'] == [new_odcs_compose]
-            if depkeys:
-                assert 'Updating signing keys' in caplog.text
-            else:
-                assert 'Updating signing keys' not in caplog.text
+            assert updated_keys == bool(depkeys)
         else:
             assert plugin_result['composes'] == [old_odcs_compose]
-            assert 'Updating signing keys' not in caplog.text
+            assert not updated_keys
 
-    def test_inject_yum_repos_from_new_compose(self, mocked_env):
-        mock_odcs_client_start_compose()
-        mock_odcs_client_wait_for_compose()
+    def test_inject_yum_repos_from_new_compose(self, mocked_env, default_odcs_mocks):
         results = self.run_plugin_with_args(mocked_env)
         yum_repourls = results.get('yum_repourls') or {}
-        expected_yum_repourls = defaultdict(list)
-        expected_yum_repourls[ODCS_COMPOSE_DEFAULT_ARCH].append(ODCS_COMPOSE_REPOFILE)
-        assert yum_repourls == expected_yum_repourls
-
-    def test_inject_yum_repos_from_existing_composes(self, mocked_env):
-        compose_ids = []
-        expected_yum_repourls = defaultdict(list)
-
-        for compose_id in range(3):
-            compose = ODCS_COMPOSE.copy()
-            compose['id'] = compose_id
-            compose['result_repofile'] = ODCS_COMPOSE_REPO + '/odcs-{}.repo'.format(compose_id)
-
-            (flexmock(ODCSClient)
-                .should_receive('wait_for_compose')
-                .once()
-                .with_args(compose_id)
-                .and_return(compose))
+        assert yum_repourls == {ODCS_COMPOSE_DEFAULT_ARCH: [ODCS_COMPOSE_REPOFILE]}
+
+    def test_inject_yum_repos_from_existing_composes(self, mocked_env, monkeypatch):
+        composes = [
+            {**ODCS_COMPOSE,
+             'id': compose_id,
+             'result_repofile': ODCS_COMPOSE_REPO + '/odcs-{}.repo'.format(compose_id)}
+            for compose_id in range(3)
+        ]
+        expected_yum_repourls = {
+            ODCS_COMPOSE_DEFAULT_ARCH: [compose['result_repofile'] for compose in composes]
+        }
 
-            compose_ids.append(compose_id)
-            expected_yum_repourls[ODCS_COMPOSE_DEFAULT_ARCH].append(compose['result_repofile'])
+        wait_calls = install_odcs_mocks(
+            monkeypatch, start_map={},
+            wait_map={compose['id']: compose for compose in composes})
 
-        (flexmock(ODCSClient)
-            .should_receive('start_compose')
-            .never())
-
-        plugin_args = {'compose_ids': compose_ids}
+        plugin_args = {'compose_ids': [compose['id'] for compose in composes]}
         results = self.run_plugin_with_args(mocked_env, plugin_args)
         yum_repourls = results.get('yum_repourls') or {}
 
+        assert wait_calls == Counter(compose['id'] for compose in composes)
         assert yum_repourls == expected_yum_repourls
 
-    def test_abort_when_odcs_config_missing(self, caplog, mocked_env):
+    def test_abort_when_odcs_config_missing(self, log_messages, mocked_env):
         # Clear out default reactor config
         mocked_env.set_reactor_config(make_reactor_config(mocked_env._tmpdir, data='version: 1'))
-        with caplog.at_level(logging.INFO):
-            self.run_plugin_with_args(mocked_env)
+        self.run_plugin_with_args(mocked_env)
 
         msg = 'Aborting plugin execution: ODCS config not found'
-        assert msg in (x.message for x in caplog.records)
+        assert msg in log_messages
 
-    def test_abort_when_compose_config_missing(self, caplog, mocked_env):
+    def test_abort_when_compose_config_missing(self, log_messages, mocked_env):
         # Clear out default git repo config
         mock_repo_config(mocked_env._tmpdir, '')
         # Ensure no compose_ids are passed to plugin
         plugin_args = {'compose_ids': tuple()}
-        with caplog.at_level(logging.INFO):
-            self.run_plugin_with_args(mocked_env, plugin_args)
+        self.run_plugin_with_args(mocked_env, plugin_args)
 
         msg = 'Aborting plugin execution: "compose" config not set and compose_ids not given'
-        assert msg in (x.message for x in caplog.records)
+        assert msg in log_messages
 
     def test_invalid_koji_build_target(self, mocked_env):
         plugin_args = {
@@ -1367,21 +1574,20 @@ class TestResolveComposes(object):
         if platforms is None:
             platforms = ODCS_COMPOSE_DEFAULT_ARCH_LIST
         plugin_args = plugin_args or {}
-        plugin_args.setdefault('odcs_url', ODCS_URL)
-        if with_target:
-            plugin_args.setdefault('koji_target', KOJI_TARGET_NAME)
-        plugin_args.setdefault('koji_hub', KOJI_HUB)
+        # one dict merge instead of setdefault probes, and the caller's dict
+        # is left untouched
+        merged_args = {**_DEFAULT_PLUGIN_ARGS, **plugin_args}
+        if not with_target and 'koji_target' not in plugin_args:
+            del merged_args['koji_target']
+        hub_url = merged_args.pop('koji_hub')
+        ssl_certs_dir = merged_args.pop('koji_ssl_certs_dir', None)
 
         workflow = mocked_env.workflow
         add_koji_map_in_workflow(workflow, root_url='',
-                                 hub_url=plugin_args.get('koji_hub'),
-                                 ssl_certs_dir=plugin_args.get('koji_ssl_certs_dir'))
-
-        del(plugin_args['koji_hub'])
-        if 'koji_ssl_certs_dir' in plugin_args:
-            del(plugin_args['koji_ssl_certs_dir'])
+                                 hub_url=hub_url,
+                                 ssl_certs_dir=ssl_certs_dir)
 
-        runner = mocked_env.set_plugin_args(plugin_args).create_runner()
+        runner = mocked_env.set_plugin_args(merged_args).create_runner()
 
         if expect_error:
             with pytest.raises(PluginFailedException) as exc_info:
@@ -1405,31 +1611,18 @@ class TestResolveComposes(object):
 
         return results
 
-    @pytest.mark.parametrize('content_sets_content, expect_error', [
-        ('', None),
-        ('null', None),
-        ('{}', None),
-        ('x86_64: ["spam-rpms"]', None),
-
-        ('"string"', 'is not of type {}'.format(', '.join([repr('object'), repr('null')]))),
-        ('x86_64: "not an array"', 'is not of type {!r}'.format('array')),
-
-        ('x86_64: []', '[] is too short'),
-        ('x86_64: [1]', '1 is not of type {!r}'.format('string')),
-        ('x86_64: ["spam"]', 'does not match'),
-        ('x86_64: ["spam-rpms-spam"]', 'does not match'),
+    @pytest.mark.parametrize('content_sets_content', _CONTENT_SETS_VALID_DOCS)
+    def test_content_sets_validation_ok(self, mocked_env, default_odcs_mocks,
+                                        content_sets_content):
+        mock_content_sets_config(mocked_env._tmpdir, content_sets_content)
+        self.run_plugin_with_args(mocked_env)
 
-        # Does not start with lowercase letter
-        ('"86_64": []', re.compile(
-            # newer versions of jsonchema reports this differently
-            r"((Additional properties are not allowed)|"
-            r"(validating 'additionalProperties' has failed))")
-         ),
-    ])
-    def test_content_sets_validation(self, mocked_env,
-                                     content_sets_content, expect_error):
-        mock_odcs_client_start_compose()
-        mock_odcs_client_wait_for_compose()
+    @pytest.mark.parametrize('content_sets_content, expect_error',
+                             _CONTENT_SETS_INVALID_CASES)
+    def test_content_sets_validation_err(self, mocked_env,
+                                         content_sets_content, expect_error):
+        # validation fails in read_configs before any ODCS call is made,
+        # so the error rows need no compose mocks at all
         mock_content_sets_config(mocked_env._tmpdir, content_sets_content)
         self.run_plugin_with_args(mocked_env, expect_error=expect_error)
 
@@ -1463,20 +1656,20 @@ class TestResolveComposes(object):
         if content_sets is not None:
             repo_config['compose']['pulp_repos'] = True
 
-        mock_repo_config(mocked_env._tmpdir, yaml.safe_dump(repo_config))
+        mock_repo_config(mocked_env._tmpdir, yaml.dump(repo_config, Dumper=YamlSafeDumper))
         if content_sets:
             mock_content_sets_config(mocked_env._tmpdir, content_sets)
 
         compose_module_id = 80
         compose_package_id = 90
         compose_pulp_id = 100
-        custom_module_compose = deepcopy(ODCS_COMPOSE)
+        custom_module_compose = ODCS_COMPOSE.copy()
         custom_module_compose['source_type'] = 2  # PungiSourceType.MODULE
         custom_module_compose['id'] = compose_module_id
-        custom_package_compose = deepcopy(ODCS_COMPOSE)
+        custom_package_compose = ODCS_COMPOSE.copy()
         custom_package_compose['source_type'] = 1
         custom_package_compose['id'] = compose_package_id
-        custom_pulp_compose = deepcopy(ODCS_COMPOSE)
+        custom_pulp_compose = ODCS_COMPOSE.copy()
         custom_pulp_compose['source_type'] = 4
         custom_pulp_compose['id'] = compose_pulp_id
 
@@ -1512,111 +1705,80 @@ class TestResolveComposes(object):
         assert include_koji_repo == expect_include_repo
 
     def test_skip_adjust_composes_for_inheritance_if_image_is_based_on_scratch(
-            self, mocked_env, caplog):
+            self, mocked_env, log_messages):
         plugin = ResolveComposesPlugin(mocked_env.workflow)
         mocked_env.set_dockerfile_images(["scratch"])
         plugin.adjust_for_inherit()
         assert ('This is a base image based on scratch. '
-                'Skipping adjusting composes for inheritance.' in caplog.text)
+                'Skipping adjusting composes for inheritance.' in log_messages)
 
     def test_skip_adjust_signing_intent_from_parent_if_image_is_based_on_scratch(
-            self, mocked_env, caplog):
+            self, mocked_env, log_messages):
         plugin = ResolveComposesPlugin(mocked_env.workflow)
         mocked_env.set_dockerfile_images(["scratch"])
         plugin.adjust_signing_intent_from_parent()
         assert ('This is a base image based on scratch. '
-                'Signing intent will not be adjusted for it.' in caplog.text)
+                'Signing intent will not be adjusted for it.' in log_messages)
 
     @pytest.mark.parametrize('cancel_compose', (True, False))
-    @responses.activate
     def test_canceling_compose_when_timeout_of_waiting_for_the_compose(
-        self, mocked_env, tmpdir, cancel_compose, caplog
+        self, mocked_env, tmpdir, cancel_compose, caplog, monkeypatch
     ):
-        repo_config = dedent("""\
-                        compose:
-                            inherit: true
-                        """)
-        mock_repo_config(mocked_env._tmpdir, repo_config)
-        parent_compose_ids = [10, 11]
+        mock_repo_config(mocked_env._tmpdir, _INHERIT_REPO_CONFIG_YAML)
+        # each parent compose, the id its renewal gets and the state the
+        # renewed compose is in when the plugin polls it after the timeout
+        parent_renew_cases = ((10, 15, 'wait'), (11, 16, 'done'))
+        parent_compose_ids = [parent_id for parent_id, _, _ in parent_renew_cases]
         mock_koji_parent(mocked_env,
                          parent_compose_ids=parent_compose_ids,
                          parent_repo=None,
                          scratch=False, isolated=False)
-        for parent_compose_id in parent_compose_ids:
-            compose = ODCS_COMPOSE.copy()
-            compose['id'] = parent_compose_id
-            compose['result_repofile'] = ODCS_COMPOSE_REPO + '/odcs-{}.repo'.format(
-                parent_compose_id)
-
-            (flexmock(ODCSClient)
-             .should_receive('wait_for_compose')
-             .once()
-             .with_args(parent_compose_id)
-             .and_return(compose))
-            # Ensure ODCS responses the compose is still waiting for process before
-            # checking the timeout.
-            parent_url = construct_compose_url(ODCS_URL, parent_compose_id)
+        # every expected wait_for_compose call goes through one dispatch dict;
+        # the timeout for the requested compose is raised from the same map
+        wait_map = {ODCS_COMPOSE_ID: _TIMEOUT_EXC}
+        # status polls and cancellations are stubbed at the client-method
+        # level; mocking the underlying GET/DELETE requests instead would
+        # only exercise the requests transport machinery for no extra cover
+        compose_states = {}
+        canceled_composes = []
+        monkeypatch.setattr(ODCSClient, 'get_compose_status',
+                            lambda self, compose_id: compose_states[compose_id])
+        monkeypatch.setattr(ODCSClient, 'cancel_compose',
+                            lambda self, compose_id: canceled_composes.append(compose_id))
+        for parent_compose_id, renew_compose_id, renew_state in parent_renew_cases:
+            compose = {**ODCS_COMPOSE,
+                       'id': parent_compose_id,
+                       'result_repofile': ODCS_COMPOSE_REPO + '/odcs-{}.repo'.format(
+                           parent_compose_id)}
+
+            wait_map[parent_compose_id] = compose
             if cancel_compose:
-                renew_compose = compose.copy()
+                renew_compose = {**compose, 'id': renew_compose_id}
                 compose['state_name'] = 'removed'
-                renew_compose['id'] += 5
-                renew_parent_url = construct_compose_url(ODCS_URL, renew_compose['id'])
                 (flexmock(ODCSClient)
                  .should_receive('renew_compose')
                  .once()
-                 .with_args(compose['id'], [])
-                 .and_return(renew_compose))
-                (flexmock(ODCSClient)
-                 .should_receive('wait_for_compose')
-                 .once()
-                 .with_args(renew_compose['id'])
+                 .with_args(parent_compose_id, [])
                  .and_return(renew_compose))
-                if renew_compose['id'] == 15:
-                    responses.add(responses.GET, url=renew_parent_url, json={
-                        'id': renew_compose['id'],
-                        'state_name': 'wait'
-                    })
-                else:
-                    responses.add(responses.GET, url=renew_parent_url, json={
-                        'id': renew_compose['id'],
-                        'state_name': 'done'
-                    })
-                responses.add(responses.DELETE, url=renew_parent_url)
-            else:
-                responses.add(responses.GET, url=parent_url, json={
-                    'id': parent_compose_id,
-                    'state_name': 'done'
-                })
-            # Ensure to cancel the compose
-            responses.add(responses.DELETE, url=parent_url)
+                wait_map[renew_compose_id] = renew_compose
+                compose_states[renew_compose_id] = renew_state
         # Fake data for an existing compose requested from ODCS.
         # No need to start a new one.
         plugin_args = {'compose_ids': [ODCS_COMPOSE_ID]}
 
-        # Ensure ODCSClient.wait_for_compose raises timeout error
-        (flexmock(ODCSClient)
-         .should_receive('wait_for_compose')
-         .with_args(ODCS_COMPOSE_ID)
-         .once()
-         .and_raise(WaitComposeToFinishTimeout(ODCS_COMPOSE_ID, ODCSClient.DEFAULT_WAIT_TIMEOUT)))
-
-        # Ensure ODCS responses the compose is still waiting for process before
-        # checking the timeout.
-        compose_url = construct_compose_url(ODCS_URL, ODCS_COMPOSE_ID)
-        responses.add(responses.GET, url=compose_url, json={
-            'id': ODCS_COMPOSE_ID,
-            'state_name': 'wait'
-        })
-        # Ensure to cancel the compose
-        responses.add(responses.DELETE, url=compose_url)
+        wait_calls = install_odcs_mocks(monkeypatch, wait_map=wait_map)
 
         with pytest.raises(PluginFailedException) as exc:
             self.run_plugin_with_args(mocked_env, plugin_args=plugin_args)
 
+        assert wait_calls == Counter(wait_map.keys())
         msg = 'Timeout of waiting for compose {}'.format(ODCS_COMPOSE_ID)
         assert msg in str(exc.value)
         if cancel_compose:
+            assert canceled_composes == [15]
             msg = 'Canceling the compose 15'
             assert msg in caplog.text
             msg = 'The compose 16 is not in progress, skip canceling'
             assert msg in caplog.text
+        else:
+            assert canceled_composes == []
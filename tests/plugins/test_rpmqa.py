@@ -31,7 +31,6 @@ PACKAGE_LIST = ['python-docker-py;1.3.1;1.fc24;noarch;(none);'
                 '1000;00000000000000000000000000000000;1436940126;(none);(none)']
 PACKAGE_LIST_WITH_AUTOGENERATED = PACKAGE_LIST + ['gpg-pubkey;qwe123;zxcasd123;(none);(none);0;'
                                                   '(none);1370645731;(none);(none)']
-PACKAGE_LIST_WITH_AUTOGENERATED_B = [x.encode("utf-8") for x in PACKAGE_LIST_WITH_AUTOGENERATED]
 
 
 pytestmark = pytest.mark.usefixtures('user_params')
@@ -66,8 +65,13 @@ def generate_archive(source_dir: Path, rpm_dir_exists=True, rpm_dir_empty=False)
     archive_path.unlink()
 
 
+# joined once; the stubs return the same blobs on every call
+_RPM_OUTPUT_BLOB = "\n".join(PACKAGE_LIST_WITH_AUTOGENERATED)
+_MOCK_LOGS_BLOB = _RPM_OUTPUT_BLOB.encode("utf-8")
+
+
 def mock_logs(cid, **kwargs):
-    return b"\n".join(PACKAGE_LIST_WITH_AUTOGENERATED_B)
+    return _MOCK_LOGS_BLOB
 
 
 def mock_logs_raise(cid, **kwargs):
@@ -101,39 +105,58 @@ def set_df_images(workflow, base_from_scratch=False):
         workflow.dockerfile_images = DockerfileImages([])
 
 
+@pytest.fixture
+def rpmqa_workflow(workflow):
+    """The workflow with the stub source attached, ready for the rpmqa runner."""
+    workflow.source = StubSource()
+    return workflow
+
+
+def make_runner(workflow, **plugin_args):
+    plugin_args.setdefault('image_id', TEST_IMAGE)
+    return PostBuildPluginsRunner(
+        workflow, [{"name": PostBuildRPMqaPlugin.key, "args": plugin_args}])
+
+
 @pytest.mark.skip(reason="plugin needs rework to get image content differently than via docker")
 @pytest.mark.parametrize('base_from_scratch', [
     True,
     False,
 ])
-@pytest.mark.parametrize("ignore_autogenerated", [
-    {"ignore": True, "package_list": PACKAGE_LIST},
-    {"ignore": False, "package_list": PACKAGE_LIST_WITH_AUTOGENERATED},
+@pytest.mark.parametrize("case", [
+    pytest.param({"logs": mock_logs, "ignore": True,
+                  "package_list": PACKAGE_LIST}, id="ignore-autogenerated"),
+    pytest.param({"logs": mock_logs, "ignore": False,
+                  "package_list": PACKAGE_LIST_WITH_AUTOGENERATED}, id="keep-autogenerated"),
+    # the failure case shares the whole setup and only swaps the logs stub
+    pytest.param({"logs": mock_logs_raise, "ignore": True,
+                  "package_list": None}, id="logs-raise"),
 ])
-def test_rpmqa_plugin_success(caplog, workflow, source_dir, base_from_scratch,
-                              ignore_autogenerated):
-    workflow.source = StubSource()
-    set_df_images(workflow, base_from_scratch=base_from_scratch)
+def test_rpmqa_plugin(caplog, rpmqa_workflow, source_dir, monkeypatch, base_from_scratch, case):
+    set_df_images(rpmqa_workflow, base_from_scratch=base_from_scratch)
 
     # mock_stream = generate_archive(source_dir)
 
+    # plain attribute swap: nothing about the call is verified, so flexmock's
+    # per-call bookkeeping would be pure overhead
+    monkeypatch.setattr(docker.APIClient, "logs", case["logs"])
+    runner = make_runner(rpmqa_workflow,
+                         ignore_autogenerated_gpg_keys=case["ignore"])
+
+    if case["package_list"] is None:
+        with pytest.raises(PluginFailedException):
+            runner.run()
+        return
+
     (flexmock(subprocess)
      .should_receive("check_output")
      .once()
-     .and_return("\n".join(PACKAGE_LIST_WITH_AUTOGENERATED)))
-
-    flexmock(docker.APIClient, logs=mock_logs)
-    runner = PostBuildPluginsRunner(
-        workflow,
-        [{"name": PostBuildRPMqaPlugin.key,
-          "args": {
-              'image_id': TEST_IMAGE,
-              "ignore_autogenerated_gpg_keys": ignore_autogenerated["ignore"]}}
-         ])
+     .and_return(_RPM_OUTPUT_BLOB))
+
     results = runner.run()
 
-    assert results[PostBuildRPMqaPlugin.key] == ignore_autogenerated["package_list"]
-    assert workflow.image_components == parse_rpm_output(ignore_autogenerated["package_list"])
+    assert results[PostBuildRPMqaPlugin.key] == case["package_list"]
+    assert rpmqa_workflow.image_components == parse_rpm_output(case["package_list"])
 
 
 @pytest.mark.skip(reason="plugin needs rework to get image content differently than via docker")
@@ -141,19 +164,13 @@ def test_rpmqa_plugin_success(caplog, workflow, source_dir, base_from_scratch,
     True,
     False,
 ])
-def test_rpmqa_plugin_rpm_query_failed(caplog, workflow, source_dir, base_from_scratch):
-    workflow.source = StubSource()
+def test_rpmqa_plugin_rpm_query_failed(caplog, rpmqa_workflow, source_dir, base_from_scratch):
+    workflow = rpmqa_workflow
     set_df_images(workflow, base_from_scratch=base_from_scratch)
 
     # mock_stream = generate_archive(source_dir)
 
-    runner = PostBuildPluginsRunner(
-        workflow,
-        [{"name": PostBuildRPMqaPlugin.key,
-          "args": {
-              'image_id': TEST_IMAGE,
-              "ignore_autogenerated_gpg_keys": True}}
-         ])
+    runner = make_runner(workflow, ignore_autogenerated_gpg_keys=True)
 
     log_msg_getting = 'getting rpms from rpmdb:'
 
@@ -175,19 +192,13 @@ def test_rpmqa_plugin_rpm_query_failed(caplog, workflow, source_dir, base_from_s
     True,
     False,
 ])
-def test_rpmqa_plugin_rpmdb_dir_is_empty(caplog, workflow, source_dir, base_from_scratch):
-    workflow.source = StubSource()
+def test_rpmqa_plugin_rpmdb_dir_is_empty(caplog, rpmqa_workflow, source_dir, base_from_scratch):
+    workflow = rpmqa_workflow
     set_df_images(workflow, base_from_scratch=base_from_scratch)
 
     # mock_stream = generate_archive(source_dir, rpm_dir_empty=True)
 
-    runner = PostBuildPluginsRunner(
-        workflow,
-        [{"name": PostBuildRPMqaPlugin.key,
-          "args": {
-              'image_id': TEST_IMAGE,
-              "ignore_autogenerated_gpg_keys": True}}
-         ])
+    runner = make_runner(workflow, ignore_autogenerated_gpg_keys=True)
 
     log_msg = f'rpmdb directory {RPMDB_PATH} is empty'
     if base_from_scratch:
@@ -208,18 +219,12 @@ def test_rpmqa_plugin_rpmdb_dir_is_empty(caplog, workflow, source_dir, base_from
     False,
 ])
 @pytest.mark.parametrize('get_archive_raises', [APIError, Exception])
-def test_rpmqa_plugin_get_archive_fails(caplog, workflow, source_dir, base_from_scratch,
+def test_rpmqa_plugin_get_archive_fails(caplog, rpmqa_workflow, source_dir, base_from_scratch,
                                         get_archive_raises):
-    workflow.source = StubSource()
+    workflow = rpmqa_workflow
     set_df_images(workflow, base_from_scratch=base_from_scratch)
 
-    runner = PostBuildPluginsRunner(
-        workflow,
-        [{"name": PostBuildRPMqaPlugin.key,
-          "args": {
-              'image_id': TEST_IMAGE,
-              "ignore_autogenerated_gpg_keys": True}}
-         ])
+    runner = make_runner(workflow, ignore_autogenerated_gpg_keys=True)
 
     # response = flexmock(content="abc", status_code=123)
 
@@ -244,11 +249,11 @@ def test_rpmqa_plugin_get_archive_fails(caplog, workflow, source_dir, base_from_
         assert workflow.image_components is None
 
 
-def test_rpmqa_plugin_skip(workflow):
+def test_rpmqa_plugin_skip(rpmqa_workflow):
     """
     Test skipping the plugin if workflow.image_components is already set
     """
-    workflow.source = StubSource()
+    workflow = rpmqa_workflow
     set_df_images(workflow)
 
     image_components = {
@@ -257,22 +262,7 @@ def test_rpmqa_plugin_skip(workflow):
     }
     setattr(workflow, 'image_components', image_components)
 
-    runner = PostBuildPluginsRunner(workflow,
-                                    [{"name": PostBuildRPMqaPlugin.key,
-                                      "args": {'image_id': TEST_IMAGE}}])
+    runner = make_runner(workflow)
     results = runner.run()
     assert results[PostBuildRPMqaPlugin.key] is None
     assert workflow.image_components == image_components
-
-
-@pytest.mark.skip(reason="plugin needs rework to get image content differently than via docker")
-def test_rpmqa_plugin_exception(workflow):
-    workflow.source = StubSource()
-    set_df_images(workflow)
-
-#    flexmock(docker.APIClient, logs=mock_logs_raise)
-    runner = PostBuildPluginsRunner(workflow,
-                                    [{"name": PostBuildRPMqaPlugin.key,
-                                      "args": {'image_id': TEST_IMAGE}}])
-    with pytest.raises(PluginFailedException):
-        runner.run()
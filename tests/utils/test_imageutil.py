@@ -6,6 +6,9 @@ This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
 
+import io
+import subprocess
+
 import pytest
 from flexmock import flexmock
 from osbs.utils import ImageName
@@ -37,6 +40,38 @@ def test_inspectable(image, is_inspectable):
     assert imageutil.image_is_inspectable(image) == is_inspectable
 
 
+@pytest.mark.parametrize("returncode", [0, 1])
+def test_get_image_stream(returncode):
+    """Test streaming an image through skopeo, including the failure path."""
+    image = "registry.com/foo/bar:latest"
+    expected_cmd = ["skopeo", "copy", "docker://{}".format(image),
+                    "docker-archive:/dev/stdout"]
+    proc_stdout = io.BytesIO(b"archive bytes")
+
+    fake_proc = flexmock(stdout=proc_stdout)
+    fake_proc.should_receive("wait").once().and_return(returncode)
+    (
+        flexmock(subprocess)
+        .should_receive("Popen")
+        .with_args(expected_cmd, stdout=subprocess.PIPE)
+        .once()
+        .and_return(fake_proc)
+    )
+
+    if returncode == 0:
+        with imageutil.get_image_stream(image) as stream:
+            assert stream.read() == b"archive bytes"
+        assert proc_stdout.closed
+    else:
+        # the nonzero exit surfaces only once the stream is consumed and closed
+        with pytest.raises(subprocess.CalledProcessError) as exc_info:
+            with imageutil.get_image_stream(image) as stream:
+                assert stream.read() == b"archive bytes"
+        assert proc_stdout.closed
+        assert exc_info.value.returncode == returncode
+        assert exc_info.value.cmd == expected_cmd
+
+
 class TestImageUtil:
     """Tests for the ImageUtil class."""
 
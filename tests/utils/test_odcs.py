@@ -182,6 +182,37 @@ def test_wait_for_compose(odcs_client, final_state_id, final_state_name, expect_
         odcs_client.wait_for_compose(COMPOSE_ID)
 
 
+@responses.activate
+def test_wait_for_composes(odcs_client):
+    compose_ids = [COMPOSE_ID, COMPOSE_ID + 1, COMPOSE_ID + 2]
+    for compose_id in compose_ids:
+        responses.add(responses.GET, '{}composes/{}'.format(ODCS_URL, compose_id),
+                      body=compose_json(2, 'done', compose_id=compose_id))
+
+    composes_info = odcs_client.wait_for_composes(compose_ids)
+    # results map to the input order, regardless of completion order
+    assert [compose_info['id'] for compose_info in composes_info] == compose_ids
+
+    assert odcs_client.wait_for_composes([]) == []
+
+
+@responses.activate
+def test_wait_for_composes_failure(odcs_client):
+    failed_compose_id = COMPOSE_ID + 1
+    compose_ids = [COMPOSE_ID, failed_compose_id, COMPOSE_ID + 2]
+    for compose_id in compose_ids:
+        if compose_id == failed_compose_id:
+            body = compose_json(4, 'failed', compose_id=compose_id)
+        else:
+            body = compose_json(2, 'done', compose_id=compose_id)
+        responses.add(responses.GET, '{}composes/{}'.format(ODCS_URL, compose_id),
+                      body=body)
+
+    expected_error = 'Failed request for compose_id={}'.format(failed_compose_id)
+    with pytest.raises(RuntimeError, match=expected_error):
+        odcs_client.wait_for_composes(compose_ids)
+
+
 @responses.activate
 def test_renew_compose(odcs_client):
     new_compose_id = COMPOSE_ID + 1